@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
-import requests
-import xml.etree.ElementTree as ET
-from datetime import datetime, timezone
 import firebase_admin
 from firebase_admin import credentials, firestore
 import json
 import os
 import sys
 import time
-import re
+
+from fetch_common.catalog_index import make_catalog_index
+from fetch_common.feed_cache import FeedCache
+from fetch_common.filter_chain import COST_API_QUOTA, COST_FIRESTORE_READ, COST_LOCAL, FilterChain, Stage
+from fetch_common.firestore_writer import INSERT_GROUP_SIZE, BatchWriter
+from fetch_common.keyword_filter import KeywordFilter
+from fetch_common.live_queue import LiveRecheckQueue
+from fetch_common.rejection_cache import RejectionCache
+from fetch_common.rss import fetch_channels
+from fetch_common.video_cache import VideoMetaCache
+from fetch_common.youtube import MAX_IDS_PER_CALL, VideoBatcher, chunk_list, enrich_videos
 
 # ---------------- CONFIG ----------------
 CHANNEL_IDS = [
@@ -60,11 +67,6 @@ if not YOUTUBE_API_KEY:
     print("❌ YOUTUBE_API_KEY env var missing")
     sys.exit(1)
 
-NS = {
-    "atom": "http://www.w3.org/2005/Atom",
-    "yt": "http://www.youtube.com/xml/schemas/2015"
-}
-
 # ---------------- FIREBASE INIT ----------------
 if not firebase_admin._apps:
     cred = credentials.Certificate(json.loads(SERVICE_ACCOUNT_JSON))
@@ -72,289 +74,269 @@ if not firebase_admin._apps:
 
 db = firestore.client()
 
-# ---------------- READ EXISTING IDS (1 READ) ----------------
-ids_doc_ref = db.collection(COLLECTION_NAME).document(ALL_IDS_DOC)
-ids_doc = ids_doc_ref.get()
+video_batcher = VideoBatcher(YOUTUBE_API_KEY)
+
+# Compiled once; case-insensitive, whole words only
+keyword_filter = KeywordFilter(EXCLUDED_KEYWORDS)
+
+# Durations/thumbnails of finished VODs never change; live status expires fast
+video_cache = VideoMetaCache()
 
-existing_ids = set()
-if ids_doc.exists:
-    existing_ids = set(ids_doc.to_dict().get("video_id", []))
+# Feeds unchanged since the last completed run are skipped entirely
+feed_cache = FeedCache("all_videos")
 
-print(f"📦 Existing video IDs in Firebase: {len(existing_ids)}")
+# Videos already rejected as too short are not looked up again
+rejection_cache = RejectionCache("all_videos")
+SHORT_REJECT_REASON = f"short<{MIN_DURATION_SECONDS}s"
+
+# Live/upcoming streams wait here until they could plausibly have ended
+live_queue = LiveRecheckQueue("all_videos")
 
 # ---------------- COUNTERS ----------------
 total_fetched = 0
 total_skipped_existing = 0
 total_skipped_live = 0
+total_skipped_missing = 0
+total_skipped_gone = 0
+total_unchanged_feeds = 0
 total_skipped_short = 0
 total_skipped_keywords = 0
+total_skipped_rejected = 0
+total_live_rechecks = 0
 total_inserted = 0
 new_ids_added = []
 
-
-def get_best_thumbnail(thumbnails: dict, video_id: str) -> str:
-    for key in ("maxres", "standard", "high", "medium", "default"):
-        if key in thumbnails and "url" in thumbnails[key]:
-            return thumbnails[key]["url"]
-
-    # Absolute safety fallback
-    return f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
+# Channels with a failed video lookup stay un-baselined for the next run
+video_channels = {}
+failed_channels = set()
 
 
-# ---------------- RSS FETCH ----------------
-def fetch_videos_from_channel(channel_id):
-    url = f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
-    try:
-        response = requests.get(url, timeout=20)
-        response.raise_for_status()
-    except Exception as e:
-        print(f"⚠️ Error fetching channel {channel_id}: {e}")
-        return []
+# ---------------- FEED CACHE COMMIT ----------------
+def commit_feed_cache():
+    """Make this run's feeds the new baseline, except channels with a failed lookup."""
+    if failed_channels:
+        print(f"⚠️ Video lookups failed on {len(failed_channels)} channel(s); those feeds will be re-processed next run.")
+    for channel_id in CHANNEL_IDS:
+        if channel_id not in failed_channels:
+            feed_cache.mark_processed(channel_id)
+    feed_cache.save()
 
-    root = ET.fromstring(response.text)
-    videos = []
 
-    entries = root.findall("atom:entry", NS)
-    
-    for entry in entries:
-        title_el = entry.find("atom:title", NS)
-        video_id_el = entry.find("yt:videoId", NS)
-        published_el = entry.find("atom:published", NS)
-
-        if title_el is None or video_id_el is None or published_el is None:
-            continue
-
-        published_dt = datetime.fromisoformat(
-            published_el.text.replace("Z", "+00:00")
-        ).astimezone(timezone.utc)
+# ---------------- MAIN LOGIC ----------------
+rss_videos = []
 
-        video_id = video_id_el.text.strip()
+# 1. Gather all videos from RSS
+# All feeds download in parallel; results come back in CHANNEL_IDS order
+for channel_id, videos, error in fetch_channels(CHANNEL_IDS, feed_cache):
+    print(f"\n🔍 Fetched channel: {channel_id}")
+    if error is not None:
+        print(f"⚠️ Error fetching channel {channel_id}: {error}")
+    if videos is None:
+        print("🔒 Feed unchanged since last run. Skipping.")
+        total_unchanged_feeds += 1
+        continue
+    print(f"📺 Videos in RSS: {len(videos)}")
+    total_fetched += len(videos)
+    rss_videos.extend(videos)
+    for v in videos:
+        video_channels.setdefault(v["video_id"], channel_id)
+
+# Queued streams come back once due, even from unchanged feeds
+due_videos = live_queue.due()
+if due_videos:
+    print(f"\n⏰ Re-checking {len(due_videos)} queued live/upcoming video(s)")
+    total_live_rechecks = len(due_videos)
+    rss_videos.extend(due_videos)
+
+if not rss_videos:
+    # Quiet poll: no parse work left, no API quota, no Firestore read
+    print("\n✅ No changed feeds to process.")
+    commit_feed_cache()
+    sys.exit(0)
 
-        videos.append({
-            "video_id": video_id,
-            "title": title_el.text.strip(),
-            "url": f"https://www.youtube.com/watch?v={video_id}",
-            "published": published_dt
-        })
+# ---------------- FILTER STAGES ----------------
+# Legacy docs have auto IDs and no video_id field; they are matched by url
+catalog_index = make_catalog_index(db, COLLECTION_NAME, ALL_IDS_DOC, "total_count", legacy_field="url")
+info_map = {}
 
-    return videos
 
+def drop_rss_duplicates(videos):
+    unique = []
+    seen = set()
+    for v in videos:
+        if v["video_id"] in seen:
+            continue
+        seen.add(v["video_id"])
+        unique.append(v)
+    return unique
 
-def fetch_thumbnails_batch(video_ids):
-    thumbnail_map = {}
-    CHUNK_SIZE = 50
 
-    for chunk in chunk_list(video_ids, CHUNK_SIZE):
-        url = "https://www.googleapis.com/youtube/v3/videos"
-        params = {
-            "part": "snippet",
-            "id": ",".join(chunk),
-            "key": YOUTUBE_API_KEY,
-            "maxResults": 50
-        }
+def drop_known_rejects(videos):
+    global total_skipped_rejected
+    rejects = rejection_cache.known_rejects([v["video_id"] for v in videos], {SHORT_REJECT_REASON})
+    total_skipped_rejected += len(rejects)
+    return [v for v in videos if v["video_id"] not in rejects]
 
-        r = requests.get(url, params=params, timeout=15)
-        r.raise_for_status()
-        data = r.json()
 
-        for item in data.get("items", []):
-            vid = item["id"]
-            thumbnails = item["snippet"].get("thumbnails", {})
-            thumbnail_map[vid] = get_best_thumbnail(thumbnails, vid)
+def drop_waiting_live(videos):
+    waiting = live_queue.waiting([v["video_id"] for v in videos])
+    return [v for v in videos if v["video_id"] not in waiting]
 
-    return thumbnail_map
 
+def drop_keyword_titles(videos):
+    global total_skipped_keywords
+    kept = []
+    for v in videos:
+        keyword = keyword_filter.match(v["title"])
+        if keyword:
+            print(f"🛑 Skipped (Keyword '{keyword}'): {v['title'][:40]}...")
+            total_skipped_keywords += 1
+            continue
+        kept.append(v)
+    return kept
 
 
-# ---------------- HELPER: CHUNK LIST ----------------
-def chunk_list(data, chunk_size):
-    """Yield successive chunks from list."""
-    for i in range(0, len(data), chunk_size):
-        yield data[i:i + chunk_size]
+def drop_existing(videos):
+    # Index lookup, only once the local stages left something
+    global total_skipped_existing
+    existing_ids = catalog_index.existing(videos)
 
-# ---------------- API HELPER: CHECK LIVE STATUS ----------------
-def get_live_status_batch(video_ids):
-    live_or_upcoming_ids = set()
-    CHUNK_SIZE = 30 
-    
-    for chunk in chunk_list(video_ids, CHUNK_SIZE):
-        url = "https://www.googleapis.com/youtube/v3/videos"
-        params = {
-            "part": "snippet",
-            "id": ",".join(chunk),
-            "key": YOUTUBE_API_KEY,
-            "maxResults": 50
-        }
-        
-        try:
-            r = requests.get(url, params=params, timeout=15)
-            r.raise_for_status()
-            data = r.json()
-            
-            for item in data.get("items", []):
-                vid = item["id"]
-                broadcast_content = item["snippet"].get("liveBroadcastContent", "none")
-                
-                if broadcast_content in ["live", "upcoming"]:
-                    live_or_upcoming_ids.add(vid)
-                    print(f"🚫 Detected Live/Upcoming stream: {vid} ({broadcast_content})")
-                    
-        except Exception as e:
-            print(f"⚠️ Error checking live status: {e}")
-    
-    return live_or_upcoming_ids
-
-# ---------------- API HELPER: FETCH DURATIONS ----------------
-def iso8601_to_seconds(duration):
-    match = re.match(r"PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?", duration)
-    if not match:
-        return 0
-    h = int(match.group(1) or 0)
-    m = int(match.group(2) or 0)
-    s = int(match.group(3) or 0)
-    return h * 3600 + m * 60 + s
-
-def fetch_durations_batch(video_ids):
-    duration_map = {}
-    CHUNK_SIZE = 50 
-
-    for chunk in chunk_list(video_ids, CHUNK_SIZE):
-        url = "https://www.googleapis.com/youtube/v3/videos"
-        params = {
-            "part": "contentDetails",
-            "id": ",".join(chunk),
-            "key": YOUTUBE_API_KEY,
-            "maxResults": 50
-        }
-
-        try:
-            r = requests.get(url, params=params, timeout=15)
-            r.raise_for_status()
-            data = r.json()
-
-            for item in data.get("items", []):
-                vid = item["id"]
-                iso = item["contentDetails"]["duration"]
-                duration_map[vid] = iso8601_to_seconds(iso)
-        except Exception as e:
-            print(f"⚠️ Error fetching durations: {e}")
-
-    return duration_map
+    kept = []
+    for v in videos:
+        if v["video_id"] in existing_ids:
+            live_queue.resolve(v["video_id"])
+            total_skipped_existing += 1
+            continue
+        kept.append(v)
+    return kept
+
+
+def drop_live_and_short(videos):
+    # Enrich: live status + duration + thumbnail (one snippet,contentDetails pass)
+    global total_skipped_missing, total_skipped_gone, total_skipped_live, total_skipped_short
+    print("\n📡 Fetching live status, durations & thumbnails...")
+    info_map.update(enrich_videos([v["video_id"] for v in videos], video_batcher, video_cache))
+
+    kept = []
+    for v in videos:
+        vid = v["video_id"]
+        info = info_map.get(vid)
+        if info is None and video_batcher.not_returned(vid):
+            # Deleted/private: final, so it must not hold back the feed cache
+            print(f"🗑️ Not returned by YouTube (deleted/private), dropping: {vid}")
+            live_queue.resolve(vid)
+            total_skipped_gone += 1
+            continue
+        if info is None:
+            print(f"⚠️ No details returned, skipping this run: {vid}")
+            if vid in video_channels:
+                failed_channels.add(video_channels[vid])
+            total_skipped_missing += 1
+            continue
+        if info.live_broadcast_content in ["live", "upcoming"]:
+            print(f"🚫 Detected Live/Upcoming stream: {vid} ({info.live_broadcast_content})")
+            live_queue.defer(v, info)
+            total_skipped_live += 1
+            continue
+        if info.duration_seconds == 0:
+            # No duration yet (still processing): retry, don't reject as short
+            print(f"⚠️ No duration returned yet, skipping this run: {vid}")
+            if vid in video_channels:
+                failed_channels.add(video_channels[vid])
+            total_skipped_missing += 1
+            continue
+        live_queue.resolve(vid)
+        if info.duration_seconds < MIN_DURATION_SECONDS:
+            print(f"⏭️ Skipped short ({info.duration_seconds}s): {vid}")
+            rejection_cache.reject(vid, SHORT_REJECT_REASON)
+            total_skipped_short += 1
+            continue
+        kept.append(v)
+    return kept
 
-# ---------------- MAIN LOGIC ----------------
-rss_videos = []
 
-# 1. Gather all videos from RSS
-for channel_id in CHANNEL_IDS:
-    print(f"\n🔍 Fetching channel: {channel_id}")
-    videos = fetch_videos_from_channel(channel_id)
-    print(f"📺 Videos in RSS: {len(videos)}")
-    total_fetched += len(videos)
-    rss_videos.extend(videos)
+# Declared in pipeline order; FilterChain runs them cheapest-first
+filter_chain = FilterChain([
+    Stage("RSS duplicates", COST_LOCAL, drop_rss_duplicates),
+    Stage("Known rejects", COST_LOCAL, drop_known_rejects),
+    Stage("Queued live/upcoming", COST_LOCAL, drop_waiting_live),
+    Stage("Title keywords", COST_LOCAL, drop_keyword_titles),
+    Stage("Already in Firebase", COST_FIRESTORE_READ, drop_existing),
+    Stage("Live/Upcoming & duration", COST_API_QUOTA, drop_live_and_short, ids_per_unit=MAX_IDS_PER_CALL),
+])
 
-# 2. Filter out Existing IDs (Local Check)
-candidates = []
-for v in rss_videos:
-    if v["video_id"] in existing_ids:
-        total_skipped_existing += 1
-        continue
-    if any(c["video_id"] == v["video_id"] for c in candidates):
-        continue
-    candidates.append(v)
+# 2. Filter: local checks first, paid lookups only for survivors
+final_videos = filter_chain.run(rss_videos)
+filter_chain.print_report()
+rejection_cache.save()
 
-print(f"\n📝 Candidates after DB check: {len(candidates)}")
+print(f"\n📝 Videos to insert: {len(final_videos)}")
 
-if not candidates:
+if not final_videos:
     print("✅ No new videos to process.")
+    live_queue.save()
+    commit_feed_cache()
     sys.exit(0)
 
-candidate_ids = [v["video_id"] for v in candidates]
-
-# 3. Check Live Status (API Call 1 - Batched)
-print("\n📡 Checking Live/Upcoming status...")
-live_ids_to_exclude = get_live_status_batch(candidate_ids)
-total_skipped_live = len(live_ids_to_exclude)
-
-vod_candidates = [v for v in candidates if v["video_id"] not in live_ids_to_exclude]
-vod_candidate_ids = [v["video_id"] for v in vod_candidates]
-
-print(f"📉 Remaining after Live filter: {len(vod_candidates)}")
-
-if not vod_candidates:
-    print("✅ No videos remaining after live check.")
-    sys.exit(0)
-
-# 4. Check Durations (API Call 2 - Batched)
-print("\n⏱️ Checking Durations...")
-duration_map = fetch_durations_batch(vod_candidate_ids)
-
-print("\n🖼️ Fetching thumbnails...")
-thumbnail_map = fetch_thumbnails_batch(vod_candidate_ids)
-
-
-# 5. Insert Final Videos
-print("\n🚀 Starting Final Filtering & Firebase Insertion...")
-for v in vod_candidates:
-    vid = v["video_id"]
-    duration = duration_map.get(vid, 0)
-    title = v["title"]
-    
-    # --- FILTER 1: Title Keywords (Regex Whole Word) ---
-    found_keyword = False
-    for keyword in EXCLUDED_KEYWORDS:
-        # \b ensures "ardas" does NOT match "sardara"
-        # re.IGNORECASE makes it case insensitive
-        pattern = r"\b" + re.escape(keyword) + r"\b"
-        if re.search(pattern, title, re.IGNORECASE):
-            found_keyword = True
-            print(f"🛑 Skipped (Keyword '{keyword}'): {title[:40]}...")
-            break
-            
-    if found_keyword:
-        total_skipped_keywords += 1
-        continue
-
-    # --- FILTER 2: Duration ---
-    if duration < MIN_DURATION_SECONDS:
-        print(f"⏭️ Skipped short ({duration}s): {vid}")
-        total_skipped_short += 1
-        continue
 
-    # --- INSERT ---
-    # FIXED: Using v["published"] instead of time.time()
-    db.collection(COLLECTION_NAME).document().set({
-        "title": v["title"],
-        "titleLowercase": v["title"].lower(),
-        "url": v["url"],
-        "imageUrl": thumbnail_map.get(
-        vid,
-        f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg"
-        ),
-        "timestamp": str(int(time.time() * 1000)),
-    })
-
-    existing_ids.add(vid)
-    new_ids_added.append(vid)
-    total_inserted += 1
-
-    print(f"➕ Inserted ({duration}s): {vid} - {title[:30]}...")
-    time.sleep(0.03)
-
-# ---------------- UPDATE ID INDEX ----------------
-if new_ids_added:
-    print(f"\n💾 Updating {ALL_IDS_DOC} index...")
-    ids_doc_ref.set({
-        "video_id": list(existing_ids),
-        "total_count": len(existing_ids)
-    }, merge=True)
+# 3. Insert Final Videos
+# Each group of inserts commits atomically together with its index update,
+# so a run that dies half-way leaves only whole groups behind and the next
+# run skips them as existing.
+print("\n🚀 Starting Firebase Insertion...")
+writer = BatchWriter(db)
+# Writes no longer land 30ms apart; keep the timestamps distinct and in order
+insert_started_ms = int(time.time() * 1000)
+for group in chunk_list(final_videos, INSERT_GROUP_SIZE):
+    with writer.atomic():
+        for v in group:
+            vid = v["video_id"]
+            info = info_map[vid]
+            duration = info.duration_seconds
+            title = v["title"]
+
+            # --- INSERT ---
+            # FIXED: Using v["published"] instead of time.time()
+            writer.set(catalog_index.new_doc_ref(v), {
+                "title": v["title"],
+                "titleLowercase": v["title"].lower(),
+                "url": v["url"],
+                "imageUrl": info.thumbnail,
+                "timestamp": str(insert_started_ms + len(new_ids_added)),
+            })
+
+            new_ids_added.append(vid)
+            print(f"➕ Inserting ({duration}s): {vid} - {title[:30]}...")
+
+        # ---------------- UPDATE ID INDEX ----------------
+        catalog_index.add(group)
+        catalog_index.save(writer)
+    total_inserted += len(group)
+    print(f"✅ Committed {len(group)} insert(s) with the index update")
+
+# Queued streams leave the queue only once their insert has committed
+live_queue.save()
+commit_feed_cache()
 
 # ---------------- SUMMARY ----------------
 print("\n================ SUMMARY ================")
 print(f"📥 Total RSS Fetched   : {total_fetched}")
+print(f"🔒 Feeds Unchanged     : {total_unchanged_feeds}")
 print(f"⏭️  Skipped (Existing)  : {total_skipped_existing}")
 print(f"🚫 Skipped (Live/Upc)  : {total_skipped_live}")
+print(f"⏳ Live queue          : {live_queue.waiting_count} waiting / {total_live_rechecks} re-checked")
+print(f"⚠️  Skipped (No details): {total_skipped_missing}")
+print(f"🗑️  Skipped (Gone)      : {total_skipped_gone}")
 print(f"🛑 Skipped (Keywords)  : {total_skipped_keywords}")
+for keyword, hits in keyword_filter.hits.most_common():
+    print(f"     - {keyword:<15}: {hits}")
 print(f"✂️  Skipped (Short)     : {total_skipped_short}")
+print(f"♻️  Skipped (Rejected)  : {total_skipped_rejected}")
 print(f"➕ Videos Inserted     : {total_inserted}")
-print(f"📊 New Firebase Total  : {len(existing_ids)}")
+print(f"📡 videos.list calls   : {video_batcher.call_count}")
+print(f"✍️  Firestore commits   : {writer.commit_count} ({writer.write_count} writes, {writer.retry_count} retries)")
+print(f"🗃️  Metadata cache      : {video_cache.hits} hits / {video_cache.misses} misses")
+print(f"🗂️  Catalog index       : {catalog_index.name}")
+if catalog_index.total is not None:
+    print(f"📊 New Firebase Total  : {catalog_index.total}")
 print("========================================")
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+import firebase_admin
+from firebase_admin import credentials, firestore
+import json
+import os
+import sys
+
+from fetch_common.feed_cache import FeedCache
+from fetch_common.live_docs import DocPathCache, LiveDocDirectory
+from fetch_common.projection import changed_fields
+from fetch_common.rss import FeedRegistry
+from fetch_common.youtube import VideoBatcher
+
+# ---------------- CONFIG ----------------
+# One row per Live-Gurdwaras-YouTube document we keep in sync.
+#   channel_id  : YouTube channel whose RSS feed is read
+#   title_match : text a video title must contain to be considered
+#   match_field : Firestore field that holds channel_id on the target doc
+#   mode        : "live"   -> prefer a currently live stream, else latest match
+#                 "latest" -> always take the latest matching upload
+LIVE_TARGETS = [
+    # ---------------- SGPC & Hukamnama ----------------
+    {
+        "name": "Harmandir Sahib",
+        "channel_id": "UCYn6UEtQ771a_OWSiNBoG8w",
+        "title_match": "Official SGPC LIVE",
+        "match_field": "gurbani_live",
+        "mode": "live",
+    },
+    {
+        "name": "Hukamnama Sachkhand Sri Harmandir Sahib",
+        "channel_id": "UCYn6UEtQ771a_OWSiNBoG8w",
+        "title_match": "Hukamnama Sachkhand Sri Harmandir Sahib",
+        "match_field": "hukamnama",
+        "mode": "latest",
+    },
+    {
+        "name": "Hukamnama Katha",
+        "channel_id": "UCYn6UEtQ771a_OWSiNBoG8w",
+        "title_match": "Hukamnama Katha",
+        "match_field": "hukamnama_katha",
+        "mode": "latest",
+    },
+    {
+        "name": "Fatehgarh Sahib Hukamnama",
+        "channel_id": "UCudVHqnOekwcvpzNpY8_ERw",
+        "title_match": "Official SGPC LIVE | Katha Hukamnama Sahib",
+        "match_field": "hukamnama_katha_fatehgarh_sahib",
+        "mode": "latest",
+    },
+
+    # ---------------- Historic Gurdwaras ----------------
+    {
+        "name": "Bangla Sahib",
+        "channel_id": "UCA1Jqo-WXVuMgs4WcD5f5Yw",
+        "title_match": "Live Gurdwara Bangla Sahib",
+        "match_field": "channel_Id",
+        "mode": "live",
+    },
+    {
+        "name": "Fatehgarh Sahib",
+        "channel_id": "UCudVHqnOekwcvpzNpY8_ERw",
+        "title_match": "Official SGPC LIVE | Gurbani Kirtan",
+        "match_field": "channel_Id",
+        "mode": "live",
+    },
+    {
+        "name": "Takht Sri Kesgarh Sahib",
+        "channel_id": "UCSx5035_us8h8DOp_YhQDaw",
+        "title_match": "Official SGPC LIVE",
+        "match_field": "channel_Id",
+        "mode": "live",
+    },
+    {
+        "name": "Damdama Sahib",
+        "channel_id": "UCY8jMpyRRcdzSf6uLiU6izQ",
+        "title_match": "Official SGPC LIVE | Takht Sri Damdama Sahib",
+        "match_field": "channel_Id",
+        "mode": "live",
+    },
+    {
+        "name": "Dukh Niwaran Sahib",
+        "channel_id": "UCPKPN4bzM8Ja-F_kIEZoAhA",
+        "title_match": "Gurdwara Dukh Niwaran Sahib",
+        "match_field": "channel_Id",
+        "mode": "live",
+    },
+    {
+        "name": "Dukh Niwaran Sahib Surrey",
+        "channel_id": "UCNYMuETXWtm6Nh1R4wGESIQ",
+        "title_match": "live stream duikh nivaran sahib surrey",
+        "match_field": "channel_Id",
+        "mode": "live",
+    },
+    {
+        "name": "Shaheed Ganj Sahib",
+        "channel_id": "UCxWx-MPft_7mKrFtN6uOaAA",
+        "title_match": "Official SGPC LIVE",
+        "match_field": "channel_Id",
+        "mode": "live",
+    },
+    {
+        "name": "Sis Ganj Sahib",
+        "channel_id": "UCPgC-jFGQTjpCU8j1DVP1Jg",
+        "title_match": "LIVE! (OFFICAL VIDEO)",
+        "match_field": "channel_Id",
+        "mode": "live",
+    },
+
+    # ---------------- Special Kirtan ----------------
+    {
+        "name": "Baba Deep Singh Kirtan",
+        "channel_id": "UCl2KY2TaNJ8jCwbO7CopvpA",
+        "title_match": "Live Gurbani Shabad Kirtan",
+        "match_field": "channel_Id",
+        "mode": "live",
+    },
+
+    # ---------------- Path ----------------
+    {
+        "name": "Rehras Sahib",
+        "channel_id": "UC5meRCEfnem7_z0O-PSNJsw",
+        "title_match": "🔴LIVE REHRAS SAHIB",
+        "match_field": "channel_id",
+        "mode": "live",
+    },
+    {
+        "name": "Japji Sahib",
+        "channel_id": "UCXliNAeYYkcRNc-K1VpuOjA",
+        "title_match": "Japji Sahib Live",
+        "match_field": "channel_Id",
+        "mode": "live",
+    },
+]
+
+COLLECTION_NAME = "Live-Gurdwaras-YouTube"
+
+# Fields compared to decide whether a target doc needs an update; change
+# detection reads only these (plus the match fields), never the whole doc.
+# Only the url counts, so hand-edited titles are left alone
+COMPARE_FIELDS = ("url",)
+
+SERVICE_ACCOUNT_JSON = os.environ.get("FIREBASE_SERVICE_ACCOUNT")
+YOUTUBE_API_KEY = os.environ.get("YOUTUBE_API_KEY")
+
+if not SERVICE_ACCOUNT_JSON:
+    print("❌ FIREBASE_SERVICE_ACCOUNT env var missing")
+    sys.exit(1)
+
+if not YOUTUBE_API_KEY:
+    print("❌ YOUTUBE_API_KEY env var missing")
+    sys.exit(1)
+# --------------------------------------
+
+# ---------------- FIREBASE INIT (ONCE PER RUN) ----------------
+if not firebase_admin._apps:
+    cred = credentials.Certificate(json.loads(SERVICE_ACCOUNT_JSON))
+    firebase_admin.initialize_app(cred)
+
+db = firestore.client()
+
+
+def get_best_thumbnail(thumbnails: dict, video_id: str) -> str:
+    for key in ("maxres", "standard", "high", "medium", "default"):
+        if key in thumbnails and "url" in thumbnails[key]:
+            return thumbnails[key]["url"]
+
+    # Absolute safety fallback (API should normally prevent this)
+    return f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
+
+
+# ---------------- RSS FETCH (MATCHING ENTRIES) ----------------
+# Each distinct channel feed is downloaded and parsed once per run, and
+# feeds unchanged since the last successful run are not parsed at all
+feed_cache = FeedCache("live")
+feeds = FeedRegistry(cache=feed_cache)
+
+
+def fetch_matching_entries(target, limit):
+    entries = feeds.entries(target["channel_id"])
+    if entries is None:
+        return None
+
+    matches = []
+    for v in entries:
+        # ✅ FILTER: per-target title match (UNCHANGED)
+        if target["title_match"] not in v["title"]:
+            continue
+        matches.append(v)
+
+        # Feeds list newest first: stop parsing once we have enough
+        if len(matches) >= limit:
+            break
+
+    # ✅ SORT BY TIME (LATEST FIRST)
+    matches.sort(key=lambda x: x["published"], reverse=True)
+    return matches
+
+
+# ---------------- YOUTUBE API (BATCHED ACROSS TARGETS) ----------------
+# Targets queue their IDs here; one dispatch serves all of them
+video_batcher = VideoBatcher(YOUTUBE_API_KEY)
+
+
+# ---------------- SELECT FINAL VIDEO ----------------
+def select_best_video(rss_videos, yt_videos):
+    yt_map = {v["id"]: v for v in yt_videos}
+
+    live_candidate = None
+    latest_candidate = None
+    latest_time = None
+
+    for v in rss_videos:
+        yt = yt_map.get(v["video_id"])
+        if not yt:
+            continue
+
+        snippet = yt["snippet"]
+        live_status = snippet.get("liveBroadcastContent")
+
+        if latest_time is None or v["published"] > latest_time:
+            latest_time = v["published"]
+            latest_candidate = yt
+
+        if live_status == "live":
+            live_candidate = yt
+            break
+
+    final = live_candidate if live_candidate else latest_candidate
+    if not final:
+        return None
+
+    video_id = final["id"]
+    thumbnails = final["snippet"].get("thumbnails", {})
+    return {
+        "title": final["snippet"]["title"],
+        "titleLowercase": final["snippet"]["title"].lower(),
+        "url": f"https://www.youtube.com/watch?v={video_id}",
+        "imageUrl": get_best_thumbnail(thumbnails, video_id)
+    }
+
+
+def select_latest_video(rss_videos, yt_videos):
+    latest = rss_videos[0]
+    video_id = latest["video_id"]
+
+    snippet_data = next((v for v in yt_videos if v["id"] == video_id), None)
+    thumbnails = snippet_data["snippet"].get("thumbnails", {}) if snippet_data else {}
+
+    return {
+        "imageUrl": get_best_thumbnail(thumbnails, video_id),
+        "title": latest["title"],
+        "titleLowercase": latest["title"].lower(),
+        "url": f"https://www.youtube.com/watch?v={video_id}"
+    }
+
+
+# ---------------- FIRESTORE UPDATE ----------------
+# Docs resolved by cached path; at most one (projected) collection read
+# for targets whose path is unknown or stale, instead of one query each
+doc_paths = DocPathCache("live")
+live_docs = LiveDocDirectory(
+    db,
+    COLLECTION_NAME,
+    match_fields=[t["match_field"] for t in LIVE_TARGETS],
+    compare_fields=COMPARE_FIELDS,
+    path_cache=doc_paths,
+)
+
+
+def update_firestore(target, data):
+    doc = live_docs.find(target["match_field"], target["channel_id"])
+
+    if doc is None:
+        print(f"❌ No Firestore document found with {target['match_field']} matching")
+        return
+
+    # 🔒 CHANGE-DETECTION (UNCHANGED; projected read of COMPARE_FIELDS only)
+    if not changed_fields(doc, data, COMPARE_FIELDS):
+        print(f"⏭ No change detected (same {target['name']}). Skipping update.")
+        return
+
+    doc.reference.update({
+        "imageUrl": data["imageUrl"],
+        "title": data["title"],
+        "titleLowercase": data["titleLowercase"],
+        "url": data["url"]
+    })
+
+    print(f"✅ {target['name']} updated successfully")
+
+
+# ---------------- PER-TARGET RUN ----------------
+def prepare_target(target):
+    """RSS stage: pick candidate videos and queue their API lookup."""
+    print(f"\n🔄 Fetching latest {target['name']} videos from RSS...")
+    limit = 1 if target["mode"] == "latest" else 5
+    rss_videos = fetch_matching_entries(target, limit)
+
+    if rss_videos is None:
+        # 🔒 Feed unchanged: no parse, no API call, no Firestore read
+        print(f"⏭ Feed unchanged since last run. Skipping {target['name']}.")
+        return None
+
+    if not rss_videos:
+        print(f"❌ No {target['name']} video found")
+        return None
+
+    if target["mode"] == "latest":
+        load = video_batcher.load([rss_videos[0]["video_id"]], parts=["snippet"])
+    else:
+        # ✅ LATEST 5 MATCHES ONLY
+        load = video_batcher.load(
+            [v["video_id"] for v in rss_videos],
+            parts=["snippet", "liveStreamingDetails"]
+        )
+
+    return {"target": target, "rss_videos": rss_videos, "load": load}
+
+
+def finish_target(plan):
+    """Selection + Firestore stage, run after the batched API dispatch."""
+    target = plan["target"]
+    yt_videos = plan["load"].result()
+
+    if target["mode"] == "latest":
+        final_video = select_latest_video(plan["rss_videos"], yt_videos)
+    else:
+        final_video = select_best_video(plan["rss_videos"], yt_videos)
+
+    if not final_video:
+        print(f"❌ No valid video selected for {target['name']}")
+        return
+
+    print(f"\n🎯 Selected {target['name']}:")
+    print(final_video)
+
+    update_firestore(target, final_video)
+
+
+# ---------------- MAIN ----------------
+if __name__ == "__main__":
+    failed = []
+    plans = []
+
+    print("🔄 Fetching channel RSS feeds (concurrently)...")
+    feeds.prefetch(t["channel_id"] for t in LIVE_TARGETS)
+
+    # One broken feed or doc must not stop the remaining targets
+    for target in LIVE_TARGETS:
+        try:
+            plan = prepare_target(target)
+        except Exception as e:
+            print(f"⚠️ Error processing {target['name']}: {e}")
+            failed.append(target["name"])
+            continue
+        if plan:
+            plans.append(plan)
+
+    print("\n📡 Fetching video details from YouTube API (batched)...")
+    video_batcher.dispatch()
+
+    # One batched read for every target doc that may need an update;
+    # on failure each target retries its own lookup below
+    try:
+        live_docs.prefetch((p["target"]["match_field"], p["target"]["channel_id"]) for p in plans)
+    except Exception as e:
+        print(f"⚠️ Error reading {COLLECTION_NAME}: {e}")
+
+    for plan in plans:
+        try:
+            finish_target(plan)
+        except Exception as e:
+            print(f"⚠️ Error processing {plan['target']['name']}: {e}")
+            failed.append(plan["target"]["name"])
+
+    # ---------------- FEED CACHE COMMIT ----------------
+    # Only channels whose every target succeeded become the new baseline
+    failed_channels = {t["channel_id"] for t in LIVE_TARGETS if t["name"] in failed}
+    for channel_id in {t["channel_id"] for t in LIVE_TARGETS} - failed_channels:
+        feed_cache.mark_processed(channel_id)
+    feed_cache.save()
+    doc_paths.save()
+
+    print("\n================ SUMMARY ================")
+    print(f"🎯 Targets processed : {len(LIVE_TARGETS)}")
+    print(f"📥 RSS feeds fetched : {feeds.fetch_count} (for {feeds.request_count} target lookups)")
+    print(f"🔒 Feeds unchanged   : {feed_cache.unchanged_count}")
+    print(f"📡 videos.list calls : {video_batcher.call_count} ({video_batcher.id_count} IDs)")
+    print(f"🗂️  Firestore queries : {live_docs.query_count} ({live_docs.doc_reads} docs read)")
+    print(f"📌 Cached doc paths  : {live_docs.path_hits} used / {live_docs.stale_paths} stale")
+    print(f"⚠️  Targets failed    : {len(failed)}")
+    for name in failed:
+        print(f"   - {name}")
+    print("========================================")
+
+    if failed:
+        sys.exit(1)
@@ -1,11 +1,5 @@
 #!/usr/bin/env python3
 
-import requests
-
-import xml.etree.ElementTree as ET
-
-from datetime import datetime, timezone
-
 import firebase_admin
 
 from firebase_admin import credentials, firestore
@@ -16,9 +10,23 @@ import os
 
 import sys
 
-import time
+from fetch_common.catalog_index import make_catalog_index
+
+from fetch_common.feed_cache import FeedCache
+
+from fetch_common.filter_chain import COST_API_QUOTA, COST_FIRESTORE_READ, COST_LOCAL, FilterChain, Stage
+
+from fetch_common.firestore_writer import INSERT_GROUP_SIZE, BatchWriter
 
-import re
+from fetch_common.live_queue import LiveRecheckQueue
+
+from fetch_common.rejection_cache import RejectionCache
+
+from fetch_common.rss import fetch_channels
+
+from fetch_common.video_cache import VideoMetaCache
+
+from fetch_common.youtube import MAX_IDS_PER_CALL, VideoBatcher, chunk_list, enrich_videos
 
 
 
@@ -71,16 +79,6 @@ if not YOUTUBE_API_KEY:
 
 
 
-NS = {
-
-    "atom": "http://www.w3.org/2005/Atom",
-
-    "yt": "http://www.youtube.com/xml/schemas/2015"
-
-}
-
-
-
 # ---------------- FIREBASE INIT ----------------
 
 if not firebase_admin._apps:
@@ -93,25 +91,31 @@ if not firebase_admin._apps:
 
 db = firestore.client()
 
+video_batcher = VideoBatcher(YOUTUBE_API_KEY)
+
+# Durations/thumbnails of finished VODs never change; live status expires fast
+
+video_cache = VideoMetaCache()
 
 
-# ---------------- READ EXISTING IDS (1 READ) ----------------
 
-ids_doc_ref = db.collection(COLLECTION_NAME).document(ALL_IDS_DOC)
+# Feeds unchanged since the last completed run are skipped entirely
 
-ids_doc = ids_doc_ref.get()
+feed_cache = FeedCache("shorts")
 
 
 
-existing_ids = set()
+# Videos already rejected as too long are not looked up again
 
-if ids_doc.exists:
+rejection_cache = RejectionCache("shorts")
 
-    existing_ids = set(ids_doc.to_dict().get("video_id", []))
+LONG_REJECT_REASON = f"long>={MAX_DURATION_SECONDS}s"
 
 
 
-print(f"📦 Existing video IDs in Firebase: {len(existing_ids)}")
+# Live/upcoming streams wait here until they could plausibly have ended
+
+live_queue = LiveRecheckQueue("shorts")
 
 
 
@@ -123,462 +127,417 @@ total_skipped_existing = 0
 
 total_skipped_live = 0
 
-total_skipped_short = 0
+total_skipped_missing = 0
 
-total_inserted = 0
-
-new_ids_added = []
+total_skipped_gone = 0
 
+total_unchanged_feeds = 0
 
+total_skipped_short = 0
 
-def get_best_thumbnail(thumbnails: dict, video_id: str) -> str:
-    for key in ("maxres", "standard", "high", "medium", "default"):
-        if key in thumbnails and "url" in thumbnails[key]:
-            return thumbnails[key]["url"]
-
-    # Absolute safety fallback
-    return f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
-
-
-
-def fetch_thumbnails_batch(video_ids):
-    thumbnail_map = {}
-    CHUNK_SIZE = 50
-
-    for chunk in chunk_list(video_ids, CHUNK_SIZE):
-        url = "https://www.googleapis.com/youtube/v3/videos"
-        params = {
-            "part": "snippet",
-            "id": ",".join(chunk),
-            "key": YOUTUBE_API_KEY,
-            "maxResults": 50
-        }
-
-        r = requests.get(url, params=params, timeout=15)
-        r.raise_for_status()
-        data = r.json()
-
-        for item in data.get("items", []):
-            vid = item["id"]
-            thumbnails = item["snippet"].get("thumbnails", {})
-            thumbnail_map[vid] = get_best_thumbnail(thumbnails, vid)
-
-    return thumbnail_map
-
-
-
-# ---------------- RSS FETCH ----------------
-
-def fetch_videos_from_channel(channel_id):
-
-    url = f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
+total_skipped_rejected = 0
 
-    try:
+total_live_rechecks = 0
 
-        response = requests.get(url, timeout=20)
+total_inserted = 0
 
-        response.raise_for_status()
+new_ids_added = []
 
-    except Exception as e:
 
-        print(f"⚠️ Error fetching channel {channel_id}: {e}")
 
-        return []
+# Channels with a failed video lookup stay un-baselined for the next run
 
+video_channels = {}
 
+failed_channels = set()
 
-    root = ET.fromstring(response.text)
 
-    videos = []
 
+# ---------------- FEED CACHE COMMIT ----------------
 
+def commit_feed_cache():
 
-    entries = root.findall("atom:entry", NS)
+    """Make this run's feeds the new baseline, except channels with a failed lookup."""
 
-    
+    if failed_channels:
 
-    for entry in entries:
+        print(f"⚠️ Video lookups failed on {len(failed_channels)} channel(s); those feeds will be re-processed next run.")
 
-        title_el = entry.find("atom:title", NS)
+    for channel_id in CHANNEL_IDS:
 
-        video_id_el = entry.find("yt:videoId", NS)
+        if channel_id not in failed_channels:
 
-        published_el = entry.find("atom:published", NS)
+            feed_cache.mark_processed(channel_id)
 
+    feed_cache.save()
 
 
-        if title_el is None or video_id_el is None or published_el is None:
-
-            continue
 
+# ---------------- MAIN LOGIC ----------------
 
+rss_videos = []
 
-        published_dt = datetime.fromisoformat(
 
-            published_el.text.replace("Z", "+00:00")
 
-        ).astimezone(timezone.utc)
+# 1. Gather all videos from RSS
 
+# All feeds download in parallel; results come back in CHANNEL_IDS order
 
+for channel_id, videos, error in fetch_channels(CHANNEL_IDS, feed_cache):
 
-        video_id = video_id_el.text.strip()
+    print(f"\n🔍 Fetched channel: {channel_id}")
 
+    if error is not None:
 
+        print(f"⚠️ Error fetching channel {channel_id}: {error}")
 
-        videos.append({
+    if videos is None:
 
-            "video_id": video_id,
+        print("🔒 Feed unchanged since last run. Skipping.")
 
-            "title": title_el.text.strip(),
+        total_unchanged_feeds += 1
 
-            "url": f"https://www.youtube.com/watch?v={video_id}",
+        continue
 
-            "published": published_dt
+    print(f"📺 Videos in RSS: {len(videos)}")
 
-        })
+    total_fetched += len(videos)
 
+    rss_videos.extend(videos)
 
+    for v in videos:
 
-    return videos
+        video_channels.setdefault(v["video_id"], channel_id)
 
 
 
-# ---------------- HELPER: CHUNK LIST ----------------
+# Queued streams come back once due, even from unchanged feeds
 
-def chunk_list(data, chunk_size):
+due_videos = live_queue.due()
 
-    """Yield successive chunks from list."""
+if due_videos:
 
-    for i in range(0, len(data), chunk_size):
+    print(f"\n⏰ Re-checking {len(due_videos)} queued live/upcoming video(s)")
 
-        yield data[i:i + chunk_size]
+    total_live_rechecks = len(due_videos)
 
+    rss_videos.extend(due_videos)
 
 
-# ---------------- API HELPER: CHECK LIVE STATUS ----------------
 
-def get_live_status_batch(video_ids):
+if not rss_videos:
 
-    """
+    # Quiet poll: no parse work left, no API quota, no Firestore read
 
-    Checks 'snippet.liveBroadcastContent'.
+    print("\n✅ No changed feeds to process.")
 
-    Returns a set of video_ids that ARE live or upcoming (to be excluded).
+    commit_feed_cache()
 
-    """
+    sys.exit(0)
 
-    live_or_upcoming_ids = set()
 
-    
 
-    # Process in chunks of 50 (YouTube API limit is 50)
+# ---------------- FILTER STAGES ----------------
 
-    # You requested 30, but 50 is safe. We can use 30 to be extra safe.
+catalog_index = make_catalog_index(db, COLLECTION_NAME, ALL_IDS_DOC, "ids_Count", legacy_field="video_id")
 
-    CHUNK_SIZE = 30 
+info_map = {}
 
-    
 
-    for chunk in chunk_list(video_ids, CHUNK_SIZE):
 
-        url = "https://www.googleapis.com/youtube/v3/videos"
+def drop_rss_duplicates(videos):
 
-        params = {
+    # De-duplicate duplicates within RSS feeds themselves
 
-            "part": "snippet",
+    unique = []
 
-            "id": ",".join(chunk),
+    seen = set()
 
-            "key": YOUTUBE_API_KEY,
+    for v in videos:
 
-            "maxResults": 50
+        if v["video_id"] in seen:
 
-        }
+            continue
 
-        
+        seen.add(v["video_id"])
 
-        try:
+        unique.append(v)
 
-            r = requests.get(url, params=params, timeout=15)
+    return unique
 
-            r.raise_for_status()
 
-            data = r.json()
 
-            
+def drop_known_rejects(videos):
 
-            for item in data.get("items", []):
+    global total_skipped_rejected
 
-                vid = item["id"]
+    rejects = rejection_cache.known_rejects([v["video_id"] for v in videos], {LONG_REJECT_REASON})
 
-                # 'none' = completed/vod (keep)
+    total_skipped_rejected += len(rejects)
 
-                # 'live' = currently live (exclude)
+    return [v for v in videos if v["video_id"] not in rejects]
 
-                # 'upcoming' = scheduled (exclude)
 
-                broadcast_content = item["snippet"].get("liveBroadcastContent", "none")
 
-                
+def drop_waiting_live(videos):
 
-                if broadcast_content in ["live", "upcoming"]:
+    waiting = live_queue.waiting([v["video_id"] for v in videos])
 
-                    live_or_upcoming_ids.add(vid)
+    return [v for v in videos if v["video_id"] not in waiting]
 
-                    print(f"🚫 Detected Live/Upcoming stream: {vid} ({broadcast_content})")
 
-                    
 
-        except Exception as e:
+def drop_existing(videos):
 
-            print(f"⚠️ Error checking live status: {e}")
+    # Index lookup, only once the local stages left something
 
-    
+    global total_skipped_existing
 
-    return live_or_upcoming_ids
+    existing_ids = catalog_index.existing(videos)
 
+    kept = []
 
+    for v in videos:
 
-# ---------------- API HELPER: FETCH DURATIONS ----------------
+        if v["video_id"] in existing_ids:
 
-def iso8601_to_seconds(duration):
+            live_queue.resolve(v["video_id"])
 
-    match = re.match(r"PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?", duration)
+            total_skipped_existing += 1
 
-    if not match:
+            continue
 
-        return 0
+        kept.append(v)
 
-    h = int(match.group(1) or 0)
+    return kept
 
-    m = int(match.group(2) or 0)
 
-    s = int(match.group(3) or 0)
 
-    return h * 3600 + m * 60 + s
+def drop_live_and_long(videos):
 
+    # Enrich: live status + duration + thumbnail (one snippet,contentDetails pass)
 
+    global total_skipped_missing, total_skipped_gone, total_skipped_live, total_skipped_short
 
-def fetch_durations_batch(video_ids):
+    print("\n📡 Fetching live status, durations & thumbnails...")
 
-    """
+    info_map.update(enrich_videos([v["video_id"] for v in videos], video_batcher, video_cache))
 
-    Fetch durations for videos in chunks.
+    kept = []
 
-    """
+    for v in videos:
 
-    duration_map = {}
+        vid = v["video_id"]
 
-    CHUNK_SIZE = 50 
+        info = info_map.get(vid)
 
+        if info is None and video_batcher.not_returned(vid):
 
+            # Deleted/private: final, so it must not hold back the feed cache
 
-    for chunk in chunk_list(video_ids, CHUNK_SIZE):
+            print(f"🗑️ Not returned by YouTube (deleted/private), dropping: {vid}")
 
-        url = "https://www.googleapis.com/youtube/v3/videos"
+            live_queue.resolve(vid)
 
-        params = {
+            total_skipped_gone += 1
 
-            "part": "contentDetails",
+            continue
 
-            "id": ",".join(chunk),
+        if info is None:
 
-            "key": YOUTUBE_API_KEY,
+            print(f"⚠️ No details returned, skipping this run: {vid}")
 
-            "maxResults": 50
+            if vid in video_channels:
 
-        }
+                failed_channels.add(video_channels[vid])
 
+            total_skipped_missing += 1
 
+            continue
 
-        try:
+        # 'none' = completed/vod (keep)
 
-            r = requests.get(url, params=params, timeout=15)
+        # 'live' = currently live (exclude)
 
-            r.raise_for_status()
+        # 'upcoming' = scheduled (exclude)
 
-            data = r.json()
+        if info.live_broadcast_content in ["live", "upcoming"]:
 
+            print(f"🚫 Detected Live/Upcoming stream: {vid} ({info.live_broadcast_content})")
 
+            live_queue.defer(v, info)
 
-            for item in data.get("items", []):
+            total_skipped_live += 1
 
-                vid = item["id"]
+            continue
 
-                iso = item["contentDetails"]["duration"]
+        if info.duration_seconds == 0:
 
-                duration_map[vid] = iso8601_to_seconds(iso)
+            # No duration yet (still processing): retry, don't insert it as a short
 
-        except Exception as e:
+            print(f"⚠️ No duration returned yet, skipping this run: {vid}")
 
-            print(f"⚠️ Error fetching durations: {e}")
+            if vid in video_channels:
 
+                failed_channels.add(video_channels[vid])
 
+            total_skipped_missing += 1
 
-    return duration_map
+            continue
 
+        live_queue.resolve(vid)
 
+        # Duration Check (Shorts only)
 
-# ---------------- MAIN LOGIC ----------------
+        if info.duration_seconds >= MAX_DURATION_SECONDS:
 
-rss_videos = []
+            print(f"⏭️ Skipped long ({info.duration_seconds}s): {vid}")
 
+            rejection_cache.reject(vid, LONG_REJECT_REASON)
 
+            total_skipped_short += 1
 
-# 1. Gather all videos from RSS
+            continue
 
-for channel_id in CHANNEL_IDS:
+        kept.append(v)
 
-    print(f"\n🔍 Fetching channel: {channel_id}")
+    return kept
 
-    videos = fetch_videos_from_channel(channel_id)
 
-    print(f"📺 Videos in RSS: {len(videos)}")
 
-    total_fetched += len(videos)
+# Declared in pipeline order; FilterChain runs them cheapest-first
 
-    rss_videos.extend(videos)
+filter_chain = FilterChain([
 
+    Stage("RSS duplicates", COST_LOCAL, drop_rss_duplicates),
 
+    Stage("Known rejects", COST_LOCAL, drop_known_rejects),
 
-# 2. Filter out Existing IDs (Local Check)
+    Stage("Queued live/upcoming", COST_LOCAL, drop_waiting_live),
 
-candidates = []
+    Stage("Already in Firebase", COST_FIRESTORE_READ, drop_existing),
 
-for v in rss_videos:
+    Stage("Live/Upcoming & duration", COST_API_QUOTA, drop_live_and_long, ids_per_unit=MAX_IDS_PER_CALL),
 
-    if v["video_id"] in existing_ids:
+])
 
-        total_skipped_existing += 1
 
-        continue
 
-    # De-duplicate duplicates within RSS feeds themselves
+# 2. Filter: local checks first, paid lookups only for survivors
 
-    if any(c["video_id"] == v["video_id"] for c in candidates):
+final_videos = filter_chain.run(rss_videos)
 
-        continue
+filter_chain.print_report()
 
-    candidates.append(v)
+rejection_cache.save()
 
 
 
-print(f"\n📝 Candidates after DB check: {len(candidates)}")
+print(f"\n📝 Videos to insert: {len(final_videos)}")
 
 
 
-if not candidates:
+if not final_videos:
 
     print("✅ No new videos to process.")
 
-    sys.exit(0)
-
-
-
-candidate_ids = [v["video_id"] for v in candidates]
+    live_queue.save()
 
+    commit_feed_cache()
 
+    sys.exit(0)
 
-# 3. Check Live Status (API Call 1 - Batched)
 
-print("\n📡 Checking Live/Upcoming status...")
 
-live_ids_to_exclude = get_live_status_batch(candidate_ids)
+# 3. Insert Final Videos
 
-total_skipped_live = len(live_ids_to_exclude)
+# Each group of inserts commits atomically together with its index update,
 
+# so a run that dies half-way leaves only whole groups behind and the next
 
+# run skips them as existing.
 
-# Remove live videos from candidates
+print("\n🚀 Starting Firebase Insertion...")
 
-vod_candidates = [v for v in candidates if v["video_id"] not in live_ids_to_exclude]
+writer = BatchWriter(db)
 
-vod_candidate_ids = [v["video_id"] for v in vod_candidates]
+for group in chunk_list(final_videos, INSERT_GROUP_SIZE):
 
+    with writer.atomic():
 
+        for v in group:
+            vid = v["video_id"]
+            info = info_map[vid]
+            duration = info.duration_seconds
 
-print(f"📉 Remaining after Live filter: {len(vod_candidates)}")
+            # Insert to Firebase
+            writer.set(catalog_index.new_doc_ref(v), {
+                "title": v["title"],
+                "url": v["url"],
+                "imageUrl": info.thumbnail,
+                "timestamp": int(v["published"].timestamp() * 1000),
+                "video_id": vid,
+            })
 
+            new_ids_added.append(vid)
+            print(f"➕ Inserting ({duration}s): {vid} - {v['title'][:30]}...")
 
 
-# 4. Check Durations (API Call 2 - Batched)
 
-# Only check duration for videos that passed the Live check
+        # ---------------- UPDATE ID INDEX ----------------
 
-print("\n⏱️ Checking Durations...")
+        catalog_index.add(group)
 
-duration_map = fetch_durations_batch(vod_candidate_ids)
+        catalog_index.save(writer)
 
-print("\n🖼️ Fetching thumbnails...")
-thumbnail_map = fetch_thumbnails_batch(vod_candidate_ids)
+    total_inserted += len(group)
 
+    print(f"✅ Committed {len(group)} insert(s) with the index update")
 
-# 5. Insert Final Videos
 
-print("\n🚀 Starting Firebase Insertion...")
 
-for v in vod_candidates:
-    vid = v["video_id"]
-    duration = duration_map.get(vid, 0)
+# Queued streams leave the queue only once their insert has committed
 
-    # Duration Check (Shorts only)
-    if duration >= MAX_DURATION_SECONDS:
-        print(f"⏭️ Skipped long ({duration}s): {vid}")
-        total_skipped_short += 1
-        continue
+live_queue.save()
 
-    # Insert to Firebase
-    db.collection(COLLECTION_NAME).document().set({
-        "title": v["title"],
-        "url": v["url"],
-        "imageUrl": thumbnail_map.get(
-        vid,
-        f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg"
-        ),
-        "timestamp": int(v["published"].timestamp() * 1000),
-        "video_id": vid,
-    })
-
-    existing_ids.add(vid)
-    new_ids_added.append(vid)
-    total_inserted += 1
-
-    print(f"➕ Inserted ({duration}s): {vid} - {v['title'][:30]}...")
-    time.sleep(0.03)
+commit_feed_cache()
 
 
 
+# ---------------- SUMMARY ----------------
 
-# ---------------- UPDATE ID INDEX ----------------
+print("\n================ SUMMARY ================")
 
-if new_ids_added:
+print(f"📥 Total RSS Fetched   : {total_fetched}")
 
-    print(f"\n💾 Updating {ALL_IDS_DOC} index...")
+print(f"🔒 Feeds Unchanged     : {total_unchanged_feeds}")
 
-    ids_doc_ref.set({
+print(f"⏭️  Skipped (Existing)  : {total_skipped_existing}")
 
-        "video_id": list(existing_ids),
+print(f"🚫 Skipped (Live/Upc)  : {total_skipped_live}")
 
-        "ids_Count": len(existing_ids)
+print(f"⏳ Live queue          : {live_queue.waiting_count} waiting / {total_live_rechecks} re-checked")
 
-    }, merge=True)
+print(f"⚠️  Skipped (No details): {total_skipped_missing}")
 
+print(f"🗑️  Skipped (Gone)      : {total_skipped_gone}")
 
+print(f"⏱️ Skipped long (≥{MAX_DURATION_SECONDS}s) : {total_skipped_short}")
 
-# ---------------- SUMMARY ----------------
+print(f"♻️  Skipped (Rejected)  : {total_skipped_rejected}")
 
-print("\n================ SUMMARY ================")
+print(f"➕ Videos Inserted     : {total_inserted}")
 
-print(f"📥 Total RSS Fetched   : {total_fetched}")
+print(f"📡 videos.list calls   : {video_batcher.call_count}")
 
-print(f"⏭️  Skipped (Existing)  : {total_skipped_existing}")
+print(f"✍️  Firestore commits   : {writer.commit_count} ({writer.write_count} writes, {writer.retry_count} retries)")
 
-print(f"🚫 Skipped (Live/Upc)  : {total_skipped_live}")
+print(f"🗃️  Metadata cache      : {video_cache.hits} hits / {video_cache.misses} misses")
 
-print(f"⏱️ Skipped long (≥{MAX_DURATION_SECONDS}s) : {total_skipped_short}")
+print(f"🗂️  Catalog index       : {catalog_index.name}")
 
-print(f"➕ Videos Inserted     : {total_inserted}")
+if catalog_index.total is not None:
 
-print(f"📊 New Firebase Total  : {len(existing_ids)}")
+    print(f"📊 New Firebase Total  : {catalog_index.total}")
 
 print("========================================")
@@ -0,0 +1,5 @@
+"""Shared helpers for the YouTube -> Firestore fetch scripts."""
+import os
+
+# Local state that persists between runs (restored by the workflow cache step)
+CACHE_DIR = os.environ.get("FETCH_CACHE_DIR", ".cache")
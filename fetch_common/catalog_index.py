@@ -0,0 +1,855 @@
+import base64
+import bisect
+import json
+import mmap
+import os
+import sys
+from array import array
+from datetime import datetime, timezone
+
+from google.cloud.firestore_v1 import ArrayUnion, FieldFilter
+
+from fetch_common import CACHE_DIR
+from fetch_common.bloom import BloomFilter
+from fetch_common.firestore_writer import BatchWriter
+from fetch_common.projection import get_projected
+from fetch_common.youtube import chunk_list
+
+# ---------------- CONFIG ----------------
+# "array"  : legacy single doc holding every ID (read whole, updated by delta)
+# "doc_id" : video docs keyed by video ID, existence via one batched get_all
+# "packed" : IDs packed as sorted 8-byte integers in Bytes chunk docs
+# "month"  : one small ID doc per published month; only the months the
+#            current RSS batch spans are read
+# "mmap"   : the packed index mirrored to local memory-mapped files,
+#            re-downloading only chunks that changed since the last sync
+CATALOG_INDEX_MODE = os.environ.get("CATALOG_INDEX_MODE", "array")
+
+# While on, the non-array modes also ArrayUnion their new IDs into the
+# legacy array doc, and every mode confirms IDs it misses with the legacy
+# field query, so runs on different modes (or switching back and forth)
+# never miss each other's inserts. Turn off only once every run has moved
+# to the same mode (CATALOG_BLOOM included).
+CATALOG_LEGACY_INDEX = os.environ.get("CATALOG_LEGACY_INDEX", "1") == "1"
+
+MAX_IN_VALUES = 30  # Firestore "in" filter limit
+
+# 8 bytes per ID; 100k IDs = 800 KB, safely under the 1 MiB doc limit
+PACKED_IDS_PER_CHUNK = int(os.environ.get("PACKED_IDS_PER_CHUNK", "100000"))
+
+# Optional Bloom prefilter. Only for modes whose lookups and adds are
+# per-video; in front of array/packed/mmap every maybe-hit and add would
+# still load the whole index, so it saves nothing. Candidates it rules
+# out are never looked up, so it also needs CATALOG_LEGACY_INDEX=0:
+# inserts from runs without the filter would not be in it
+BLOOM_MODES = ("doc_id", "month")
+CATALOG_BLOOM = os.environ.get("CATALOG_BLOOM", "0") == "1"
+BLOOM_CAPACITY = int(os.environ.get("BLOOM_CAPACITY", "1000000"))
+BLOOM_FP_RATE = float(os.environ.get("BLOOM_FP_RATE", "0.01"))
+BLOOM_CHUNK_BYTES = 900_000
+# --------------------------------------
+
+
+# ---------------- LEGACY LOOKUPS ----------------
+def query_legacy_field(collection, field, videos):
+    """
+    IDs of the given videos that already have a doc, found with "in"
+    queries on a field written by every insert (the video ID or the
+    watch URL). Works for auto-ID docs; costs one query per 30 videos.
+    """
+    by_value = {}
+    for v in videos:
+        value = v["video_id"] if field == "video_id" else v[field]
+        by_value[value] = v["video_id"]
+
+    found = set()
+    for chunk in chunk_list(list(by_value), MAX_IN_VALUES):
+        query = (
+            collection
+            .where(filter=FieldFilter(field, "in", chunk))
+            .select([field])
+        )
+        for snap in query.get():
+            found.add(by_value.get(snap.get(field)))
+    found.discard(None)
+    return found
+
+
+def scan_collection_ids(collection, field):
+    """
+    Every video ID in the collection (full projected scan; rebuilds only).
+    The index docs share the collection and carry an ID array under the
+    same field, so only values that are well-formed video IDs count.
+    """
+    fields = [field] if field else []
+    for snap in collection.select(fields).stream():
+        if pack_video_id(snap.id) is not None:
+            yield snap.id
+            continue
+        value = (snap.to_dict() or {}).get(field) if field else None
+        if isinstance(value, str):
+            video_id = value.rsplit("v=", 1)[-1] if field == "url" else value
+            if pack_video_id(video_id) is not None:
+                yield video_id
+
+
+def confirm_misses(index, field, videos):
+    """
+    Candidates a derived index does not hold that have a doc anyway
+    (inserted by a run on another mode), via the legacy field query. They
+    are added back to the index, so it heals with the next save.
+    """
+    if not field or not videos:
+        return set()
+
+    found = query_legacy_field(index.collection, field, videos)
+    if found:
+        print(f"🩹 {len(found)} catalogued ID(s) missing from the {index.name} index; adding them back")
+        index.add([v for v in videos if v["video_id"] in found])
+    return found
+
+
+class ArrayIndex:
+    """
+    Legacy index: one document with every catalogued ID in an array. Read
+    whole, but written as an ArrayUnion delta of the new IDs only, with
+    the absolute count next to it so a re-sent batch cannot inflate it.
+    With legacy_field set, misses are confirmed by query, for inserts made
+    by other modes before they mirrored into this doc.
+    """
+
+    name = "array"
+
+    def __init__(self, db, collection_name, ids_doc, count_field, legacy_field=None):
+        self.collection = db.collection(collection_name)
+        self.ids_doc = ids_doc
+        self.legacy_field = legacy_field
+        self.ids_doc_ref = self.collection.document(ids_doc)
+        self.count_field = count_field
+        self._ids = None
+        self._added = []
+
+    def _load(self):
+        if self._ids is None:
+            snap = self.ids_doc_ref.get()
+            self._ids = set(snap.to_dict().get("video_id", [])) if snap.exists else set()
+            print(f"📦 Existing video IDs in Firebase: {len(self._ids)}")
+        return self._ids
+
+    def existing(self, videos):
+        ids = self._load()
+        found = {v["video_id"] for v in videos if v["video_id"] in ids}
+        return found | confirm_misses(self, self.legacy_field, [v for v in videos if v["video_id"] not in found])
+
+    def iter_ids(self):
+        return iter(self._load())
+
+    def new_doc_ref(self, video):
+        return self.collection.document()
+
+    def add(self, videos):
+        ids = self._load()
+        for v in videos:
+            # Already-present IDs would inflate the count
+            if v["video_id"] not in ids:
+                ids.add(v["video_id"])
+                self._added.append(v["video_id"])
+
+    def save(self, writer):
+        if not self._added:
+            return
+        # Only the new IDs go over the wire, not the whole array
+        print(f"\n💾 Updating {self.ids_doc} index (+{len(self._added)})...")
+        writer.set(self.ids_doc_ref, {
+            "video_id": ArrayUnion(self._added),
+            self.count_field: len(self._ids),
+        }, merge=True)
+        self._added = []
+
+    @property
+    def total(self):
+        return len(self._ids) if self._ids is not None else None
+
+
+class DocIdIndex:
+    """
+    Video docs are keyed by their video ID, so a membership check is one
+    batched get_all over the candidates, with no index document to read
+    or rewrite. Docs written before this mode have auto IDs; candidates
+    not found by ID are looked up once more by legacy_field with an "in"
+    query, so old videos are not inserted twice.
+    """
+
+    name = "doc_id"
+
+    def __init__(self, db, collection_name, legacy_field=None):
+        self.db = db
+        self.collection = db.collection(collection_name)
+        self.legacy_field = legacy_field
+
+    def existing(self, videos):
+        if not videos:
+            return set()
+
+        refs = [self.collection.document(v["video_id"]) for v in videos]
+        # Empty field mask: only existence is needed, not the document body
+        found = {snap.id for snap in get_projected(self.db, refs, []).values() if snap.exists}
+
+        if self.legacy_field:
+            remaining = [v for v in videos if v["video_id"] not in found]
+            if remaining:
+                found |= query_legacy_field(self.collection, self.legacy_field, remaining)
+
+        return found
+
+    def iter_ids(self):
+        return scan_collection_ids(self.collection, self.legacy_field)
+
+    def new_doc_ref(self, video):
+        return self.collection.document(video["video_id"])
+
+    def add(self, videos):
+        pass
+
+    def save(self, writer):
+        pass
+
+    @property
+    def total(self):
+        return None  # not tracked; counting would read the whole collection
+
+
+# ---------------- PACKED ID ENCODING ----------------
+def pack_video_id(video_id):
+    """
+    11 base64url chars carry exactly 64 bits (the last char only uses 4),
+    so every YouTube ID maps to one unsigned 64-bit integer. Returns None
+    for anything that is not a well-formed ID.
+    """
+    if len(video_id) != 11:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(video_id + "=")
+    except ValueError:
+        return None
+    # Round-trip rejects IDs whose last char has stray low bits set
+    if base64.urlsafe_b64encode(raw)[:11].decode() != video_id:
+        return None
+    return int.from_bytes(raw, "big")
+
+
+def unpack_video_id(value):
+    return base64.urlsafe_b64encode(value.to_bytes(8, "big"))[:11].decode()
+
+
+def _to_bytes(values):
+    packed = array("Q", values)
+    if packed.itemsize != 8:
+        raise RuntimeError("array('Q') is not 64-bit on this platform")
+    if sys.byteorder == "little":
+        packed.byteswap()  # stored big-endian so chunks are portable
+    return packed.tobytes()
+
+
+def _from_bytes(blob):
+    packed = array("Q")
+    packed.frombytes(blob)
+    if sys.byteorder == "little":
+        packed.byteswap()
+    return packed
+
+
+class PackedIndex:
+    """
+    IDs stored as big-endian uint64 in Bytes fields, split across chunk
+    docs listed by a small manifest doc. Loads straight into one sorted
+    array('Q') and answers membership with binary search. New IDs only
+    ever go to the last chunk, so a save rewrites that chunk and the
+    manifest, never the whole index. Seeded once from the legacy array
+    doc when no manifest exists yet; with legacy_field set, misses are
+    confirmed by query afterwards (see confirm_misses).
+    """
+
+    name = "packed"
+
+    def __init__(self, db, collection_name, ids_doc, count_field, legacy_field=None):
+        self.db = db
+        self.collection = db.collection(collection_name)
+        self.ids_doc = ids_doc
+        self.legacy_field = legacy_field
+        self.legacy_ref = self.collection.document(ids_doc)
+        self.manifest_ref = self.collection.document(f"{ids_doc}_packed")
+        self.count_field = count_field
+        self._sorted = None
+        self._chunks = []      # packed ints per chunk doc, in chunk order
+        self._dirty = set()    # chunk numbers to rewrite on save
+        self._seen = set()
+
+    def _chunk_ref(self, n):
+        return self.collection.document(f"{self.ids_doc}_packed_{n}")
+
+    def _load(self):
+        if self._sorted is not None:
+            return self._sorted
+
+        manifest = self.manifest_ref.get()
+        if manifest.exists:
+            refs = [self._chunk_ref(n) for n in range(manifest.to_dict().get("chunks", 0))]
+            # get_all returns in any order; put the chunks back in sequence
+            blobs = {
+                snap.id: snap.to_dict().get("ids", b"")
+                for snap in self.db.get_all(refs) if snap.exists
+            }
+            self._chunks = [list(_from_bytes(blobs.get(ref.id, b""))) for ref in refs]
+        else:
+            # One-time migration from the legacy string array
+            legacy = self.legacy_ref.get()
+            ids = legacy.to_dict().get("video_id", []) if legacy.exists else []
+            values = [pack_video_id(vid) for vid in ids]
+            skipped = values.count(None)
+            if skipped:
+                print(f"⚠️ {skipped} malformed IDs left out of the packed index")
+            values = sorted(v for v in set(values) if v is not None)
+            self._chunks = [
+                values[i:i + PACKED_IDS_PER_CHUNK]
+                for i in range(0, len(values), PACKED_IDS_PER_CHUNK)
+            ]
+            self._dirty = set(range(len(self._chunks)))
+            print(f"🧱 Seeding packed index from {self.ids_doc}")
+
+        self._sorted = array("Q", sorted(v for chunk in self._chunks for v in chunk))
+        print(f"📦 Existing video IDs in Firebase: {len(self._sorted)} (packed)")
+        return self._sorted
+
+    def __contains__(self, video_id):
+        value = pack_video_id(video_id)
+        if value is None:
+            return False
+        ids = self._load()
+        i = bisect.bisect_left(ids, value)
+        return i < len(ids) and ids[i] == value
+
+    def existing(self, videos):
+        self._load()
+        found = {v["video_id"] for v in videos if v["video_id"] in self}
+        return found | confirm_misses(self, self.legacy_field, [v for v in videos if v["video_id"] not in found])
+
+    def iter_ids(self):
+        return (unpack_video_id(value) for value in self._load())
+
+    def new_doc_ref(self, video):
+        return self.collection.document()
+
+    def add(self, videos):
+        self._load()
+        for vid in (v["video_id"] for v in videos):
+            value = pack_video_id(vid)
+            if value is None or vid in self._seen or vid in self:
+                continue
+            self._seen.add(vid)
+
+            if not self._chunks or len(self._chunks[-1]) >= PACKED_IDS_PER_CHUNK:
+                self._chunks.append([])
+            self._chunks[-1].append(value)
+            self._dirty.add(len(self._chunks) - 1)
+            bisect.insort(self._sorted, value)
+
+    def save(self, writer):
+        if not self._dirty:
+            return
+        print(f"\n💾 Updating {self.ids_doc} packed index ({len(self._dirty)} chunk(s))...")
+        for n in sorted(self._dirty):
+            writer.set(self._chunk_ref(n), {"ids": _to_bytes(sorted(self._chunks[n]))})
+        writer.set(self.manifest_ref, {
+            "chunks": len(self._chunks),
+            "chunk_counts": [len(chunk) for chunk in self._chunks],
+            "format": "uint64be",
+            self.count_field: len(self._sorted),
+        })
+        self._dirty = set()
+
+    @property
+    def total(self):
+        return len(self._sorted) if self._sorted is not None else None
+
+
+# ---------------- LOCAL MMAP MIRROR ----------------
+class MmapIndex:
+    """
+    Local mirror of the packed index: one native-endian uint64 file per
+    chunk doc under CACHE_DIR, memory-mapped and binary-searched in place,
+    so no ID set is built at startup. Chunks only grow by appends, so a
+    sync compares per-chunk counts from the manifest with the local ones
+    and downloads only the chunks that differ (usually none or the last).
+    Inserts append to the last chunk and update the mirror directly.
+    Misses are confirmed by legacy_field as in PackedIndex.
+    """
+
+    name = "mmap"
+
+    def __init__(self, db, collection_name, ids_doc, count_field, legacy_field=None, local_dir=None):
+        self.db = db
+        self.collection_name = collection_name
+        self.collection = db.collection(collection_name)
+        self.ids_doc = ids_doc
+        self.count_field = count_field
+        self.legacy_field = legacy_field
+        self.manifest_ref = self.collection.document(f"{ids_doc}_packed")
+        self.local_dir = os.path.join(local_dir or CACHE_DIR, f"ids_{collection_name}")
+        self._counts = None
+        self._views = {}
+        self._pending = []
+        self.downloaded_chunks = 0
+
+    def _chunk_ref(self, n):
+        return self.collection.document(f"{self.ids_doc}_packed_{n}")
+
+    def _chunk_path(self, n):
+        return os.path.join(self.local_dir, f"chunk_{n}.u64")
+
+    def _meta_path(self):
+        return os.path.join(self.local_dir, "meta.json")
+
+    def _write_local(self, n, values):
+        tmp_path = self._chunk_path(n) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            array("Q", values).tofile(f)
+        self._views.pop(n, None)
+        os.replace(tmp_path, self._chunk_path(n))
+
+    def _save_meta(self):
+        tmp_path = self._meta_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"chunk_counts": self._counts}, f)
+        os.replace(tmp_path, self._meta_path())
+
+    def _sync(self):
+        if self._counts is not None:
+            return self._counts
+
+        os.makedirs(self.local_dir, exist_ok=True)
+        manifest = self.manifest_ref.get()
+        if not manifest.exists:
+            print("🧱 No packed index yet; seeding it first")
+            seed = PackedIndex(self.db, self.collection_name, self.ids_doc, self.count_field)
+            seed.existing([])
+            writer = BatchWriter(self.db)
+            seed.save(writer)
+            writer.flush()
+            manifest = self.manifest_ref.get()
+
+        meta = manifest.to_dict() if manifest.exists else {}
+        # Manifests written before chunk_counts existed force a full sync
+        remote = meta.get("chunk_counts") or [None] * meta.get("chunks", 0)
+
+        local = []
+        try:
+            with open(self._meta_path(), encoding="utf-8") as f:
+                local = json.load(f).get("chunk_counts", [])
+        except (OSError, ValueError):
+            pass
+
+        counts = []
+        changed = []
+        for n, count in enumerate(remote):
+            same = count is not None and n < len(local) and local[n] == count
+            if same and os.path.exists(self._chunk_path(n)):
+                counts.append(count)
+            else:
+                counts.append(None)
+                changed.append(n)
+
+        if changed:
+            refs = [self._chunk_ref(n) for n in changed]
+            blobs = {
+                snap.id: snap.to_dict().get("ids", b"")
+                for snap in self.db.get_all(refs) if snap.exists
+            }
+            for n, ref in zip(changed, refs):
+                values = sorted(_from_bytes(blobs.get(ref.id, b"")))
+                self._write_local(n, values)
+                counts[n] = len(values)
+            self.downloaded_chunks += len(changed)
+
+        self._counts = counts
+        self._save_meta()
+        print(f"📦 Existing video IDs in Firebase: {sum(counts)} (local mirror, {len(changed)} chunk(s) synced)")
+        return counts
+
+    def _view(self, n):
+        if n not in self._views:
+            path = self._chunk_path(n)
+            if os.path.getsize(path) == 0:
+                self._views[n] = ()
+            else:
+                with open(path, "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._views[n] = memoryview(mapped).cast("Q")
+        return self._views[n]
+
+    def __contains__(self, video_id):
+        value = pack_video_id(video_id)
+        if value is None:
+            return False
+        for n in range(len(self._sync())):
+            view = self._view(n)
+            i = bisect.bisect_left(view, value)
+            if i < len(view) and view[i] == value:
+                return True
+        return value in self._pending
+
+    def existing(self, videos):
+        self._sync()
+        found = {v["video_id"] for v in videos if v["video_id"] in self}
+        return found | confirm_misses(self, self.legacy_field, [v for v in videos if v["video_id"] not in found])
+
+    def iter_ids(self):
+        for n in range(len(self._sync())):
+            for value in self._view(n):
+                yield unpack_video_id(value)
+
+    def new_doc_ref(self, video):
+        return self.collection.document()
+
+    def add(self, videos):
+        for v in videos:
+            value = pack_video_id(v["video_id"])
+            if value is not None and v["video_id"] not in self:
+                self._pending.append(value)
+
+    def save(self, writer):
+        if not self._pending:
+            return
+
+        counts = self._sync()
+        last = len(counts) - 1
+        values = list(self._view(last)) if last >= 0 else []
+        if last < 0 or len(values) >= PACKED_IDS_PER_CHUNK:
+            last, values = last + 1, []
+            counts.append(0)
+
+        # Fill the last chunk, spilling into new ones when full
+        pending = self._pending
+        written = []
+        while pending:
+            room = PACKED_IDS_PER_CHUNK - len(values)
+            values = sorted(values + pending[:room])
+            pending = pending[room:]
+            written.append((last, values))
+            if pending:
+                last, values = last + 1, []
+                counts.append(0)
+
+        print(f"\n💾 Updating {self.ids_doc} packed index ({len(written)} chunk(s))...")
+        for n, chunk in written:
+            writer.set(self._chunk_ref(n), {"ids": _to_bytes(chunk)})
+            counts[n] = len(chunk)
+        writer.set(self.manifest_ref, {
+            "chunks": len(counts),
+            "chunk_counts": counts,
+            "format": "uint64be",
+            self.count_field: sum(counts),
+        })
+        self._pending = []
+
+        # The mirror only follows once Firestore has the chunks
+        def update_mirror():
+            for n, chunk in written:
+                self._write_local(n, chunk)
+            self._save_meta()
+        writer.after_commit(update_mirror)
+
+    @property
+    def total(self):
+        if self._counts is None:
+            return None
+        return sum(self._counts) + len(self._pending)
+
+
+# ---------------- MONTH PARTITIONS ----------------
+def month_key(published):
+    return published.astimezone(timezone.utc).strftime("%Y-%m")
+
+
+class MonthIndex:
+    """
+    IDs partitioned by published month in {ids_doc}_YYYY-MM docs, so a
+    run reads only the months its RSS batch spans (usually one or two
+    small docs) no matter how large the catalog is.
+
+    Partitions are only complete from the month after this mode was first
+    used ("complete_since" in the {ids_doc}_months manifest). Older
+    candidates, and anything published before that, fall back to the
+    legacy-field query. With confirm_legacy, partition misses go through
+    that query too.
+    """
+
+    name = "month"
+
+    def __init__(self, db, collection_name, ids_doc, legacy_field, confirm_legacy=False):
+        self.db = db
+        self.collection = db.collection(collection_name)
+        self.ids_doc = ids_doc
+        self.legacy_field = legacy_field
+        self.confirm_legacy = confirm_legacy
+        self.manifest_ref = self.collection.document(f"{ids_doc}_months")
+        self._complete_since = None
+        self._new_manifest = False
+        self._months = {}
+        self._added = {}
+        self.partition_reads = 0
+
+    def _partition_ref(self, month):
+        return self.collection.document(f"{self.ids_doc}_{month}")
+
+    def _load_manifest(self):
+        if self._complete_since is not None:
+            return self._complete_since
+
+        snap = self.manifest_ref.get()
+        if snap.exists and snap.to_dict().get("complete_since"):
+            self._complete_since = snap.to_dict()["complete_since"]
+        else:
+            # Docs inserted earlier this month are in no partition yet
+            now = datetime.now(timezone.utc)
+            year, month = (now.year + 1, 1) if now.month == 12 else (now.year, now.month + 1)
+            self._complete_since = f"{year:04d}-{month:02d}"
+            self._new_manifest = True
+            print(f"🗓️ Starting month partitions; complete from {self._complete_since}")
+        return self._complete_since
+
+    def _load_months(self, months):
+        missing = [m for m in months if m not in self._months]
+        if not missing:
+            return
+
+        refs = [self._partition_ref(m) for m in missing]
+        by_id = {
+            snap.id: set(snap.to_dict().get("video_id", []))
+            for snap in self.db.get_all(refs) if snap.exists
+        }
+        for month, ref in zip(missing, refs):
+            self._months[month] = by_id.get(ref.id, set())
+        self.partition_reads += len(missing)
+
+    def existing(self, videos):
+        if not videos:
+            return set()
+
+        complete_since = self._load_manifest()
+        partitioned = [v for v in videos if month_key(v["published"]) >= complete_since]
+        older = [v for v in videos if month_key(v["published"]) < complete_since]
+
+        self._load_months(sorted({month_key(v["published"]) for v in partitioned}))
+        found = {
+            v["video_id"] for v in partitioned
+            if v["video_id"] in self._months[month_key(v["published"])]
+        }
+        print(f"🗓️ Read {self.partition_reads} month partition(s); {len(older)} older candidate(s) via {self.legacy_field}")
+
+        if older:
+            found |= query_legacy_field(self.collection, self.legacy_field, older)
+        if self.confirm_legacy:
+            found |= confirm_misses(self, self.legacy_field, [v for v in partitioned if v["video_id"] not in found])
+        return found
+
+    def iter_ids(self):
+        return scan_collection_ids(self.collection, self.legacy_field)
+
+    def new_doc_ref(self, video):
+        return self.collection.document()
+
+    def add(self, videos):
+        # Partitions are loaded first so the count written is the full size
+        self._load_months(sorted({month_key(v["published"]) for v in videos}))
+        for v in videos:
+            month = month_key(v["published"])
+            if v["video_id"] not in self._months[month]:
+                self._months[month].add(v["video_id"])
+                self._added.setdefault(month, []).append(v["video_id"])
+
+    def save(self, writer):
+        # ArrayUnion plus an absolute count: a re-sent batch cannot inflate it
+        for month, ids in sorted(self._added.items()):
+            writer.set(self._partition_ref(month), {
+                "video_id": ArrayUnion(ids),
+                "count": len(self._months[month]),
+            }, merge=True)
+        if self._new_manifest:
+            writer.set(self.manifest_ref, {"complete_since": self._complete_since}, merge=True)
+            self._new_manifest = False
+        self._added = {}
+
+    @property
+    def total(self):
+        return None
+
+
+# ---------------- BLOOM PREFILTER ----------------
+class BloomIndex:
+    """
+    Bloom filter in front of another index. Candidates the filter rules
+    out are new without touching the inner index; only "maybe present"
+    ones are confirmed against it, so the inner index must answer those
+    with point lookups (see BLOOM_MODES). The filter is kept in chunked
+    Bytes docs and only the chunks whose bits changed are rewritten.
+
+    It is only maintained by runs that have it enabled, which is why it
+    is refused while CATALOG_LEGACY_INDEX allows mixing runs.
+    """
+
+    def __init__(self, db, inner, collection_name, ids_doc,
+                 capacity=BLOOM_CAPACITY, fp_rate=BLOOM_FP_RATE):
+        self.db = db
+        self.inner = inner
+        self.name = f"bloom+{inner.name}"
+        self.collection = db.collection(collection_name)
+        self.ids_doc = ids_doc
+        self.manifest_ref = self.collection.document(f"{ids_doc}_bloom")
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self._bloom = None
+        self.ruled_out = 0
+        self.false_positives = 0
+
+    def _chunk_ref(self, n):
+        return self.collection.document(f"{self.ids_doc}_bloom_{n}")
+
+    def _load(self):
+        if self._bloom is not None:
+            return self._bloom
+
+        manifest = self.manifest_ref.get()
+        if manifest.exists:
+            meta = manifest.to_dict()
+            refs = [self._chunk_ref(n) for n in range(meta["chunks"])]
+            blobs = {
+                snap.id: snap.to_dict().get("bits", b"")
+                for snap in self.db.get_all(refs) if snap.exists
+            }
+            bits = b"".join(blobs.get(ref.id, b"") for ref in refs)
+            self._bloom = BloomFilter(meta["num_bits"], meta["num_hashes"], bits, meta.get("count", 0))
+            if len(self._bloom.bits) != (self._bloom.num_bits + 7) // 8:
+                raise RuntimeError(f"Bloom filter {self.ids_doc}_bloom is incomplete; delete it to rebuild")
+        else:
+            print(f"🌸 Building Bloom filter for {self.ids_doc} from the {self.inner.name} index...")
+            self._bloom = BloomFilter.for_capacity(self.capacity, self.fp_rate)
+            for vid in self.inner.iter_ids():
+                self._bloom.add(vid)
+            self._bloom.dirty_bytes = set(range(len(self._bloom.bits)))
+
+        if self._bloom.count > self._bloom.capacity_for(self.fp_rate):
+            print(f"⚠️ Bloom filter holds {self._bloom.count} IDs, over capacity; raise BLOOM_CAPACITY and rebuild")
+        return self._bloom
+
+    def existing(self, videos):
+        bloom = self._load()
+        maybe = [v for v in videos if v["video_id"] in bloom]
+        self.ruled_out += len(videos) - len(maybe)
+
+        found = self.inner.existing(maybe) if maybe else set()
+        self.false_positives += len(maybe) - len(found)
+        print(f"🌸 Bloom: {len(videos) - len(maybe)} new for sure, {len(maybe)} checked, {len(maybe) - len(found)} false positive(s)")
+        return found
+
+    def iter_ids(self):
+        return self.inner.iter_ids()
+
+    def new_doc_ref(self, video):
+        return self.inner.new_doc_ref(video)
+
+    def add(self, videos):
+        bloom = self._load()
+        for v in videos:
+            bloom.add(v["video_id"])
+        self.inner.add(videos)
+
+    def save(self, writer):
+        # Filter first: a filter ahead of the index only costs a false
+        # positive, one behind it would wrongly rule out catalogued IDs
+        bloom = self._bloom
+        if bloom is not None and bloom.dirty_bytes:
+            chunks = sorted({byte // BLOOM_CHUNK_BYTES for byte in bloom.dirty_bytes})
+            for n in chunks:
+                start = n * BLOOM_CHUNK_BYTES
+                writer.set(self._chunk_ref(n), {"bits": bytes(bloom.bits[start:start + BLOOM_CHUNK_BYTES])})
+            writer.set(self.manifest_ref, {
+                "num_bits": bloom.num_bits,
+                "num_hashes": bloom.num_hashes,
+                "chunks": -(-len(bloom.bits) // BLOOM_CHUNK_BYTES),
+                "count": bloom.count,
+            })
+            bloom.dirty_bytes = set()
+
+        self.inner.save(writer)
+
+    @property
+    def total(self):
+        return self.inner.total
+
+
+# ---------------- LEGACY MIRROR ----------------
+class LegacyArrayMirror:
+    """
+    Keeps the legacy array doc current under any other mode, so runs still
+    on (or going back to) "array" see every insert. Only the new IDs are
+    sent, as an ArrayUnion; the count field is left to array mode, which
+    rewrites it from the full set on its next save.
+    """
+
+    def __init__(self, db, inner, collection_name, ids_doc):
+        self.inner = inner
+        self.name = f"{inner.name}+legacy"
+        self.ids_doc_ref = db.collection(collection_name).document(ids_doc)
+        self._added = []
+
+    def existing(self, videos):
+        return self.inner.existing(videos)
+
+    def iter_ids(self):
+        return self.inner.iter_ids()
+
+    def new_doc_ref(self, video):
+        return self.inner.new_doc_ref(video)
+
+    def add(self, videos):
+        self._added.extend(v["video_id"] for v in videos)
+        self.inner.add(videos)
+
+    def save(self, writer):
+        if self._added:
+            writer.set(self.ids_doc_ref, {"video_id": ArrayUnion(self._added)}, merge=True)
+            self._added = []
+        self.inner.save(writer)
+
+    @property
+    def total(self):
+        return self.inner.total
+
+
+def make_catalog_index(db, collection_name, ids_doc, count_field, legacy_field, mode=None, bloom=None, legacy=None):
+    mode = mode or CATALOG_INDEX_MODE
+    legacy = CATALOG_LEGACY_INDEX if legacy is None else legacy
+    confirm_field = legacy_field if legacy else None
+    if mode == "array":
+        index = ArrayIndex(db, collection_name, ids_doc, count_field, confirm_field)
+    elif mode == "doc_id":
+        index = DocIdIndex(db, collection_name, legacy_field)
+    elif mode == "packed":
+        index = PackedIndex(db, collection_name, ids_doc, count_field, confirm_field)
+    elif mode == "mmap":
+        index = MmapIndex(db, collection_name, ids_doc, count_field, confirm_field)
+    elif mode == "month":
+        index = MonthIndex(db, collection_name, ids_doc, legacy_field, confirm_legacy=legacy)
+    else:
+        raise ValueError(f"Unknown CATALOG_INDEX_MODE: {mode}")
+
+    if CATALOG_BLOOM if bloom is None else bloom:
+        if mode not in BLOOM_MODES:
+            raise ValueError(f"CATALOG_BLOOM needs CATALOG_INDEX_MODE in {BLOOM_MODES}, not {mode}")
+        if legacy:
+            raise ValueError("CATALOG_BLOOM needs CATALOG_LEGACY_INDEX=0 (every run on the same mode)")
+        index = BloomIndex(db, index, collection_name, ids_doc)
+    if legacy and mode != "array":
+        index = LegacyArrayMirror(db, index, collection_name, ids_doc)
+    return index
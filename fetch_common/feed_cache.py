@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from fetch_common import CACHE_DIR
+from fetch_common.rss import parse_feed
+
+# ---------------- CONFIG ----------------
+# A feed that has not been fully processed for this long is treated as
+# changed, so live/upcoming status flips that do not touch the XML are
+# still picked up periodically.
+FEED_CACHE_MAX_AGE_SECONDS = int(os.environ.get("FEED_CACHE_MAX_AGE_SECONDS", "1800"))
+# --------------------------------------
+
+
+def feed_digest(entries):
+    """
+    Hash of what the pipelines read from a feed: (video_id, title,
+    published) per parsed entry. Raw bytes would not do, since view counts
+    and star ratings in each entry change on almost every poll.
+    """
+    h = hashlib.sha256()
+    for entry in entries:
+        h.update(f"{entry['video_id']}\t{entry['title']}\t{entry['published'].isoformat()}\n".encode())
+    return h.hexdigest()
+
+
+class FeedCache:
+    """
+    Persistent per-channel ETag / Last-Modified / content hash store.
+
+    Validators from a fresh download are only staged; they become the
+    baseline for the next run once the caller reports that channel as
+    fully processed (mark_processed) and calls save(). A run that dies
+    half-way therefore re-processes the feed next time.
+    """
+
+    def __init__(self, pipeline, max_age=FEED_CACHE_MAX_AGE_SECONDS):
+        # One file per pipeline: each decides on its own what "processed" means
+        self.path = os.path.join(CACHE_DIR, f"feed_cache_{pipeline}.json")
+        self.max_age = max_age
+        self._entries = {}
+        self._staged = {}
+        self.unchanged_count = 0
+        self.changed_count = 0
+        self._lock = threading.Lock()  # feeds are checked from a thread pool
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring unreadable feed cache {self.path}: {e}")
+
+    def _fresh_entry(self, channel_id):
+        entry = self._entries.get(channel_id)
+        if not entry:
+            return None
+        if time.time() - entry.get("checked_at", 0) > self.max_age:
+            return None
+        return entry
+
+    def conditional_headers(self, channel_id):
+        entry = self._fresh_entry(channel_id)
+        if not entry:
+            return {}
+
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def changed_entries(self, channel_id, response):
+        """
+        Parsed entries of a changed feed, or None for a 304 or a 200 whose
+        entries hash to the last processed ones. The entries are returned
+        so the caller does not parse the feed a second time.
+        """
+        entry = self._fresh_entry(channel_id)
+
+        if response.status_code == 304 and entry:
+            with self._lock:
+                self.unchanged_count += 1
+            return None
+
+        response.raise_for_status()
+        entries = parse_feed(response.content)
+        digest = feed_digest(entries)
+
+        with self._lock:
+            if entry and entry.get("sha256") == digest:
+                self.unchanged_count += 1
+                return None
+
+            self.changed_count += 1
+            self._staged[channel_id] = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "sha256": digest,
+            }
+            return entries
+
+    def mark_processed(self, channel_id):
+        staged = self._staged.pop(channel_id, None)
+        if staged is not None:
+            staged["checked_at"] = time.time()
+            self._entries[channel_id] = staged
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,74 @@
+import math
+
+# Stage cost classes; cheaper stages always run first
+COST_LOCAL = 0
+COST_FIRESTORE_READ = 1
+COST_API_QUOTA = 2
+
+COST_LABELS = {
+    COST_LOCAL: "local",
+    COST_FIRESTORE_READ: "firestore",
+    COST_API_QUOTA: "api quota",
+}
+
+
+class Stage:
+    """
+    One filter step. `run` takes the surviving video dicts and returns
+    the ones to keep. API stages set ids_per_unit to how many IDs one
+    quota unit covers (50 for videos.list).
+    """
+
+    def __init__(self, name, cost, run, ids_per_unit=None):
+        self.name = name
+        self.cost = cost
+        self.run = run
+        self.ids_per_unit = ids_per_unit
+        self.count_in = 0
+        self.count_out = 0
+        self.ran = False
+        self.quota_saved = 0
+
+
+class FilterChain:
+    """
+    Runs stages cheapest-first (declaration order within a cost class)
+    and only passes survivors on, so videos a local check would reject
+    never cost API quota or Firestore reads. Stops as soon as nothing
+    survives.
+    """
+
+    def __init__(self, stages):
+        self.stages = sorted(stages, key=lambda s: s.cost)
+
+    def run(self, videos):
+        for i, stage in enumerate(self.stages):
+            if not videos:
+                break
+
+            stage.count_in = len(videos)
+            videos = stage.run(videos)
+            stage.count_out = len(videos)
+            stage.ran = True
+
+            # Units the later API stages would have spent on what this stage dropped
+            for later in self.stages[i + 1:]:
+                if later.ids_per_unit:
+                    stage.quota_saved += (
+                        math.ceil(stage.count_in / later.ids_per_unit)
+                        - math.ceil(stage.count_out / later.ids_per_unit)
+                    )
+
+        return videos
+
+    def print_report(self):
+        print("\n🧮 Filter stages (cheapest first):")
+        for stage in self.stages:
+            label = COST_LABELS.get(stage.cost, stage.cost)
+            if not stage.ran:
+                print(f"   - {stage.name:<28} [{label}] not needed")
+                continue
+            line = f"   - {stage.name:<28} [{label}] {stage.count_in} → {stage.count_out}"
+            if stage.quota_saved:
+                line += f" (saved {stage.quota_saved} quota unit(s))"
+            print(line)
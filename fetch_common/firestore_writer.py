@@ -0,0 +1,121 @@
+import os
+import random
+import time
+from contextlib import contextmanager
+
+from google.api_core import exceptions as gexc
+
+# ---------------- CONFIG ----------------
+MAX_BATCH_OPS = 500  # Firestore WriteBatch limit
+# Inserts per atomic commit group; the rest of the batch is left for the
+# index writes that go out with them
+INSERT_GROUP_SIZE = int(os.environ.get("INSERT_GROUP_SIZE", "400"))
+if not 0 < INSERT_GROUP_SIZE < MAX_BATCH_OPS:
+    raise ValueError(f"INSERT_GROUP_SIZE must be between 1 and {MAX_BATCH_OPS - 1}, got {INSERT_GROUP_SIZE}")
+WRITE_MAX_RETRIES = int(os.environ.get("WRITE_MAX_RETRIES", "5"))
+WRITE_MAX_BACKOFF_SECONDS = 30.0
+
+# Worth retrying: contention, throttling and transient server errors.
+# A WriteBatch is all-or-nothing, but after a timeout or server error it
+# may already have applied, so re-sending is only safe because every
+# write is idempotent (plain sets and ArrayUnion, never Increment).
+RETRYABLE_ERRORS = (
+    gexc.Aborted,
+    gexc.DeadlineExceeded,
+    gexc.InternalServerError,
+    gexc.ResourceExhausted,
+    gexc.ServiceUnavailable,
+)
+# --------------------------------------
+
+
+class BatchWriter:
+    """
+    Buffers writes into WriteBatches of at most max_ops and commits each
+    with exponential backoff. The pause adapts: it grows while Firestore
+    pushes back and shrinks again after clean commits, replacing a fixed
+    per-write sleep. after_commit() callbacks run once the batch holding
+    the writes queued so far has committed. Writes queued inside atomic()
+    go out in one batch, or not at all.
+    """
+
+    def __init__(self, db, max_ops=MAX_BATCH_OPS):
+        self.db = db
+        self.max_ops = max_ops
+        self._batch = db.batch()
+        self._ops = 0
+        self._callbacks = []
+        self._atomic = False
+        self._delay = 0.0
+        self.commit_count = 0
+        self.write_count = 0
+        self.retry_count = 0
+
+    def _make_room(self):
+        if self._ops < self.max_ops:
+            return
+        if self._atomic:
+            # Splitting the batch would commit part of the group on its own
+            raise RuntimeError(f"Atomic write group is over {self.max_ops} ops; lower INSERT_GROUP_SIZE")
+        self.flush()
+
+    def set(self, ref, data, merge=False):
+        self._make_room()
+        self._batch.set(ref, data, merge=merge)
+        self._ops += 1
+
+    def update(self, ref, data):
+        self._make_room()
+        self._batch.update(ref, data)
+        self._ops += 1
+
+    @contextmanager
+    def atomic(self):
+        """Commit the writes queued in this block as one batch on exit."""
+        self.flush()
+        self._atomic = True
+        try:
+            yield self
+        finally:
+            self._atomic = False
+        self.flush()
+
+    @property
+    def pending(self):
+        return self._ops
+
+    def after_commit(self, callback):
+        self._callbacks.append(callback)
+
+    def _commit(self):
+        for attempt in range(WRITE_MAX_RETRIES + 1):
+            if self._delay:
+                time.sleep(self._delay)
+            try:
+                self._batch.commit()
+                self._delay /= 2
+                if self._delay < 0.05:
+                    self._delay = 0.0
+                return
+            except RETRYABLE_ERRORS as e:
+                if attempt == WRITE_MAX_RETRIES:
+                    raise
+                self.retry_count += 1
+                self._delay = min(max(self._delay * 2, 0.5), WRITE_MAX_BACKOFF_SECONDS)
+                self._delay *= random.uniform(0.8, 1.2)
+                print(f"⚠️ Batch commit failed ({type(e).__name__}); retrying in {self._delay:.1f}s")
+
+    def flush(self):
+        if not self._ops:
+            return
+
+        self._commit()
+        self.commit_count += 1
+        self.write_count += self._ops
+
+        callbacks = self._callbacks
+        self._batch = self.db.batch()
+        self._ops = 0
+        self._callbacks = []
+        for callback in callbacks:
+            callback()
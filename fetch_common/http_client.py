@@ -0,0 +1,89 @@
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Optional HTTP/2 support: needs `pip install httpx[http2]`
+try:
+    import httpx
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when h2 is present)
+except ImportError:
+    httpx = None
+
+
+def _env_timeout(name, default):
+    """Read a "connect,read" pair of seconds from the environment."""
+    raw = os.environ.get(name)
+    if not raw:
+        return default
+    connect, read = raw.split(",")
+    return float(connect), float(read)
+
+
+# ---------------- CONFIG ----------------
+POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "10"))
+USE_HTTP2 = os.environ.get("HTTP_USE_HTTP2", "1") == "1" and httpx is not None
+
+# (connect, read) seconds per pipeline stage
+TIMEOUTS = {
+    "rss": _env_timeout("HTTP_TIMEOUT_RSS", (5, 20)),
+    "api": _env_timeout("HTTP_TIMEOUT_API", (5, 20)),
+}
+# --------------------------------------
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def _new_client():
+    if USE_HTTP2:
+        return httpx.Client(
+            http2=True,
+            follow_redirects=True,  # match requests' default
+            limits=httpx.Limits(
+                max_connections=POOL_SIZE,
+                max_keepalive_connections=POOL_SIZE
+            )
+        )
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def client_for(url):
+    """Persistent keep-alive client for the URL's host, created on first use."""
+    host = urlsplit(url).netloc
+    with _lock:
+        if host not in _clients:
+            _clients[host] = _new_client()
+        return _clients[host]
+
+
+def get(url, params=None, headers=None, stage="api"):
+    """
+    GET through the pooled client for the URL's host, so the TCP+TLS
+    handshake is paid once per host per run. Returns a requests or httpx
+    response; both expose status_code, headers, text, content, json()
+    and raise_for_status().
+    """
+    connect, read = TIMEOUTS[stage]
+    client = client_for(url)
+
+    if USE_HTTP2:
+        timeout = httpx.Timeout(read, connect=connect)
+    else:
+        timeout = (connect, read)
+
+    return client.get(url, params=params, headers=headers, timeout=timeout)
+
+
+def close_all():
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
@@ -0,0 +1,31 @@
+import re
+from collections import Counter
+
+
+class KeywordFilter:
+    """
+    Whole-word, case-insensitive keyword matcher. The keyword list is
+    compiled once into a single alternation regex, so each title is
+    scanned once no matter how many keywords there are.
+    """
+
+    def __init__(self, keywords):
+        self._canonical = {k.lower(): k for k in keywords}
+
+        # Longest first so "antim ardaas" is reported over "ardaas"
+        alternation = "|".join(
+            re.escape(k) for k in sorted(self._canonical, key=len, reverse=True)
+        )
+        # \b ensures "ardas" does NOT match "sardara"
+        self._pattern = re.compile(r"\b(?:" + alternation + r")\b", re.IGNORECASE)
+        self.hits = Counter()
+
+    def match(self, title):
+        """Return the first excluded keyword found in the title, or None."""
+        m = self._pattern.search(title)
+        if m is None:
+            return None
+
+        keyword = self._canonical.get(m.group(0).lower(), m.group(0))
+        self.hits[keyword] += 1
+        return keyword
@@ -0,0 +1,136 @@
+import json
+import os
+
+from fetch_common import CACHE_DIR
+from fetch_common.projection import get_projected
+
+
+class DocPathCache:
+    """Persisted target key -> Firestore document path, validated on use."""
+
+    def __init__(self, name):
+        self.path = os.path.join(CACHE_DIR, f"doc_paths_{name}.json")
+        self._paths = {}
+        self._dirty = False
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._paths = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring unreadable doc path cache {self.path}: {e}")
+
+    @staticmethod
+    def key(match_field, value):
+        return f"{match_field}={value}"
+
+    def get(self, match_field, value):
+        return self._paths.get(self.key(match_field, value))
+
+    def put(self, match_field, value, doc_path):
+        key = self.key(match_field, value)
+        if self._paths.get(key) != doc_path:
+            self._paths[key] = doc_path
+            self._dirty = True
+
+    def drop(self, match_field, value):
+        if self._paths.pop(self.key(match_field, value), None) is not None:
+            self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._paths, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+
+class LiveDocDirectory:
+    """
+    Resolves live targets to their Live-Gurdwaras-YouTube docs, keyed by
+    (match_field, value). Known doc paths are read directly with one
+    batched, projected get_all and checked to still carry the match
+    field; anything unknown, moved or deleted falls back to a single
+    projected read of the (small) collection, which refreshes the paths.
+    Nothing is read until a target actually needs its doc.
+    """
+
+    def __init__(self, db, collection_name, match_fields, compare_fields=("url",), path_cache=None):
+        self.db = db
+        self.collection = db.collection(collection_name)
+        self.match_fields = sorted(set(match_fields))
+        self.compare_fields = tuple(compare_fields)
+        self.path_cache = path_cache
+        self._docs = {}
+        self._scanned = None
+        self.query_count = 0
+        self.doc_reads = 0
+        self.path_hits = 0
+        self.stale_paths = 0
+
+    @property
+    def fields(self):
+        return sorted(set(self.match_fields) | set(self.compare_fields))
+
+    def _scan(self):
+        snaps = self.collection.select(self.fields).get()
+        self.query_count += 1
+        self.doc_reads += len(snaps)
+
+        found = {}
+        for snap in snaps:
+            data = snap.to_dict() or {}
+            for field in self.match_fields:
+                value = data.get(field)
+                if value is not None:
+                    # First match wins, as with the old limit(1) query
+                    found.setdefault((field, value), snap)
+        return found
+
+    def prefetch(self, keys):
+        keys = [k for k in dict.fromkeys(keys) if k not in self._docs]
+        if not keys:
+            return
+
+        cached = {}
+        if self.path_cache is not None:
+            for key in keys:
+                path = self.path_cache.get(*key)
+                if path:
+                    cached.setdefault(path, []).append(key)
+
+        if cached:
+            snaps = get_projected(self.db, (self.db.document(path) for path in cached), self.fields)
+            self.doc_reads += len(snaps)
+            for path, snap in snaps.items():
+                # Several targets may share one doc
+                for key in cached.get(path, []):
+                    field, value = key
+                    if snap.exists and (snap.to_dict() or {}).get(field) == value:
+                        self._docs[key] = snap
+                        self.path_hits += 1
+                    else:
+                        print(f"⚠️ Cached doc for {field} is gone or changed; looking it up again")
+                        self.path_cache.drop(field, value)
+                        self.stale_paths += 1
+
+        missing = [k for k in keys if k not in self._docs]
+        if missing:
+            # At most one collection read per run
+            if self._scanned is None:
+                self._scanned = self._scan()
+            for key in missing:
+                snap = self._scanned.get(key)
+                self._docs[key] = snap
+                if snap is not None and self.path_cache is not None:
+                    self.path_cache.put(*key, snap.reference.path)
+
+    def find(self, match_field, value):
+        """Snapshot (projected to the compare fields) of the target doc, or None."""
+        key = (match_field, value)
+        if key not in self._docs:
+            self.prefetch([key])
+        return self._docs.get(key)
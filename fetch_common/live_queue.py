@@ -0,0 +1,106 @@
+import json
+import os
+import time
+from datetime import datetime
+
+from fetch_common.video_cache import connect_cache_db
+
+# ---------------- CONFIG ----------------
+# Shortest broadcast worth re-checking for; the wait doubles on every
+# re-check that still finds the video live, up to the cap.
+LIVE_RECHECK_SECONDS = int(os.environ.get("LIVE_RECHECK_SECONDS", "3600"))
+LIVE_RECHECK_MAX_SECONDS = int(os.environ.get("LIVE_RECHECK_MAX_SECONDS", str(6 * 3600)))
+# --------------------------------------
+
+
+def _next_check(info, attempts, now):
+    wait = min(LIVE_RECHECK_SECONDS * (2 ** attempts), LIVE_RECHECK_MAX_SECONDS)
+
+    # Upcoming: nothing can change before the stream even starts
+    start = info.actual_start or info.scheduled_start or now
+    return max(start, now) + wait
+
+
+class LiveRecheckQueue:
+    """
+    Live/upcoming videos a catalog pipeline has set aside, with the time
+    they could plausibly have finished. Until then they are dropped
+    locally instead of being looked up again; once due they are handed
+    back as candidates, even if they have left the RSS window meanwhile.
+    """
+
+    def __init__(self, pipeline, conn=None):
+        self.pipeline = pipeline
+        self.conn = conn or connect_cache_db()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending_live ("
+            " pipeline TEXT NOT NULL,"
+            " video_id TEXT NOT NULL,"
+            " video TEXT NOT NULL,"
+            " recheck_after REAL NOT NULL,"
+            " attempts INTEGER NOT NULL,"
+            " PRIMARY KEY (pipeline, video_id))"
+        )
+        self.conn.commit()
+        self._deferred = {}
+        self._resolved = set()
+        self.waiting_count = 0
+
+    def _rows(self):
+        return self.conn.execute(
+            "SELECT video_id, video, recheck_after, attempts FROM pending_live WHERE pipeline = ?",
+            (self.pipeline,)
+        ).fetchall()
+
+    def due(self):
+        """Queued videos whose re-check time has passed, as RSS-style dicts."""
+        now = time.time()
+        videos = []
+        for _, video, recheck_after, _ in self._rows():
+            if recheck_after > now:
+                continue
+            v = json.loads(video)
+            v["published"] = datetime.fromisoformat(v["published"])
+            videos.append(v)
+        return videos
+
+    def waiting(self, video_ids):
+        """IDs that are queued and not yet due."""
+        now = time.time()
+        video_ids = set(video_ids)
+        waiting = {
+            video_id for video_id, _, recheck_after, _ in self._rows()
+            if video_id in video_ids and recheck_after > now
+        }
+        self.waiting_count += len(waiting)
+        return waiting
+
+    def defer(self, video, info):
+        self._deferred[video["video_id"]] = (video, info)
+
+    def resolve(self, video_id):
+        """The video is no longer live/upcoming (or already catalogued)."""
+        self._resolved.add(video_id)
+
+    def save(self):
+        now = time.time()
+        attempts = {video_id: n for video_id, _, _, n in self._rows()}
+
+        rows = []
+        for video_id, (video, info) in self._deferred.items():
+            n = attempts.get(video_id, -1) + 1
+            stored = dict(video, published=video["published"].isoformat())
+            rows.append((self.pipeline, video_id, json.dumps(stored), _next_check(info, n, now), n))
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO pending_live (pipeline, video_id, video, recheck_after, attempts)"
+            " VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        self.conn.executemany(
+            "DELETE FROM pending_live WHERE pipeline = ? AND video_id = ?",
+            [(self.pipeline, video_id) for video_id in self._resolved - set(self._deferred)]
+        )
+        self.conn.commit()
+        self._deferred.clear()
+        self._resolved.clear()
@@ -0,0 +1,21 @@
+def get_projected(db, refs, fields):
+    """
+    One batched read of only `fields` for each document reference, via a
+    field mask. An empty list reads existence only. Snapshots come back in
+    any order, so they are returned keyed by document path.
+    """
+    refs = list(refs)
+    if not refs:
+        return {}
+    return {snap.reference.path: snap for snap in db.get_all(refs, field_paths=list(fields))}
+
+
+def changed_fields(snapshot, data, fields):
+    """
+    The subset of `data` whose `fields` differ from the (projected)
+    snapshot; empty when nothing changed. A missing doc counts as changed.
+    """
+    existing = {}
+    if snapshot is not None and snapshot.exists:
+        existing = snapshot.to_dict() or {}
+    return {field: data.get(field) for field in fields if existing.get(field) != data.get(field)}
@@ -0,0 +1,68 @@
+import os
+import time
+
+from fetch_common.video_cache import connect_cache_db
+
+# ---------------- CONFIG ----------------
+# Rejections are re-checked after this long, so a video whose reason no
+# longer applies (e.g. the threshold changed) is eventually reconsidered.
+REJECTION_TTL_SECONDS = int(os.environ.get("REJECTION_TTL_SECONDS", str(7 * 24 * 3600)))
+# --------------------------------------
+
+
+class RejectionCache:
+    """
+    Videos a pipeline already rejected after paying for their details,
+    keyed by (pipeline, video_id) with the reason. Lookups only honour
+    reasons the caller still applies, so changing a threshold (and with it
+    the reason string) invalidates the old entries at once.
+    """
+
+    def __init__(self, pipeline, conn=None, ttl=REJECTION_TTL_SECONDS):
+        self.pipeline = pipeline
+        self.ttl = ttl
+        self.conn = conn or connect_cache_db()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS rejected_videos ("
+            " pipeline TEXT NOT NULL,"
+            " video_id TEXT NOT NULL,"
+            " reason TEXT NOT NULL,"
+            " rejected_at REAL NOT NULL,"
+            " PRIMARY KEY (pipeline, video_id))"
+        )
+        self.conn.commit()
+        self._pending = {}
+        self.hits = 0
+
+    def known_rejects(self, video_ids, reasons):
+        """Map of video_id -> reason for IDs with a fresh, still-applicable rejection."""
+        cutoff = time.time() - self.ttl
+        found = {}
+
+        for vid in video_ids:
+            row = self.conn.execute(
+                "SELECT reason, rejected_at FROM rejected_videos WHERE pipeline = ? AND video_id = ?",
+                (self.pipeline, vid)
+            ).fetchone()
+            if row is None:
+                continue
+            reason, rejected_at = row
+            if reason in reasons and rejected_at >= cutoff:
+                found[vid] = reason
+
+        self.hits += len(found)
+        return found
+
+    def reject(self, video_id, reason):
+        self._pending[video_id] = reason
+
+    def save(self):
+        if not self._pending:
+            return
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO rejected_videos (pipeline, video_id, reason, rejected_at) VALUES (?, ?, ?, ?)",
+            [(self.pipeline, vid, reason, now) for vid, reason in self._pending.items()]
+        )
+        self.conn.commit()
+        self._pending.clear()
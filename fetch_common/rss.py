@@ -0,0 +1,197 @@
+import io
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from fetch_common import http_client
+
+# Optional faster parser backend; the stdlib one is used when lxml is missing
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+YT = "{http://www.youtube.com/xml/schemas/2015}"
+
+RSS_PARSER = os.environ.get("RSS_PARSER", "lxml" if lxml_etree is not None else "stdlib")
+
+
+def feed_url(channel_id):
+    return f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
+
+
+# ---------------- RSS PARSE (STREAMING) ----------------
+def _entry_record(entry):
+    title_el = entry.find(ATOM + "title")
+    video_id_el = entry.find(YT + "videoId")
+    published_el = entry.find(ATOM + "published")
+
+    if title_el is None or video_id_el is None or published_el is None:
+        return None
+
+    published_dt = datetime.fromisoformat(
+        published_el.text.replace("Z", "+00:00")
+    ).astimezone(timezone.utc)
+
+    video_id = video_id_el.text.strip()
+
+    return {
+        "video_id": video_id,
+        "title": title_el.text.strip(),
+        "url": f"https://www.youtube.com/watch?v={video_id}",
+        "published": published_dt
+    }
+
+
+def iter_feed_entries(raw, backend=None):
+    """
+    Yield entry dicts one at a time from the raw feed bytes, in feed order
+    (newest first). Parsing only advances as far as the caller iterates,
+    so breaking out of the loop skips the rest of the document.
+    """
+    backend = backend or RSS_PARSER
+    source = io.BytesIO(raw)
+
+    if backend == "lxml" and lxml_etree is not None:
+        events = lxml_etree.iterparse(source, events=("end",), tag=ATOM + "entry")
+    else:
+        events = ET.iterparse(source, events=("end",))
+
+    for _, elem in events:
+        if elem.tag != ATOM + "entry":
+            continue
+
+        record = _entry_record(elem)
+        elem.clear()  # finished entries are not kept in the tree
+
+        if record is not None:
+            yield record
+
+
+def parse_feed(raw):
+    """Parse a whole channel feed into entry dicts, in feed order."""
+    return list(iter_feed_entries(raw))
+
+
+class LazyEntries:
+    """
+    Replayable, lazily parsed entries of one feed. Several readers can
+    iterate it; the document is parsed only as far as the furthest reader
+    has gone, and already-parsed entries are served from memory.
+    """
+
+    def __init__(self, raw):
+        self._source = iter_feed_entries(raw)
+        self._parsed = []
+
+    def __iter__(self):
+        i = 0
+        while True:
+            if i < len(self._parsed):
+                yield self._parsed[i]
+                i += 1
+                continue
+
+            if self._source is None:
+                return
+
+            try:
+                self._parsed.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+
+# ---------------- RSS FETCH ----------------
+def fetch_channel_feed(channel_id, cache=None, parse=parse_feed):
+    """
+    Entries of one channel feed, or None when a FeedCache is given and the
+    feed is unchanged since it was last fully processed. The cache has to
+    parse the whole feed to hash it, so its entry list is returned as is
+    instead of handing the bytes to `parse` again.
+    """
+    headers = cache.conditional_headers(channel_id) if cache else None
+    response = http_client.get(feed_url(channel_id), headers=headers, stage="rss")
+
+    if cache is not None:
+        return cache.changed_entries(channel_id, response)
+
+    response.raise_for_status()
+    return parse(response.content)
+
+
+# ---------------- CONCURRENT FAN-OUT ----------------
+MAX_FEED_WORKERS = 8
+
+
+def fetch_channels(channel_ids, cache=None, parse=parse_feed, max_workers=MAX_FEED_WORKERS):
+    """
+    Fetch many channel feeds in parallel with bounded concurrency.
+    Returns (channel_id, videos, error) tuples in channel order; a failed
+    feed yields an empty list plus its exception instead of raising, and
+    an unchanged feed (with a cache) yields videos=None.
+    """
+    channel_ids = list(channel_ids)
+    if not channel_ids:
+        return []
+
+    def fetch_one(channel_id):
+        try:
+            return channel_id, fetch_channel_feed(channel_id, cache, parse), None
+        except Exception as e:
+            return channel_id, [], e
+
+    workers = min(max_workers, len(channel_ids))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fetch_one, channel_ids))
+
+
+# ---------------- FEED REGISTRY ----------------
+class FeedRegistry:
+    """
+    Fetches each distinct channel feed at most once per run. Targets
+    sharing a channel read the same LazyEntries, so the XML is parsed once
+    and only as deep as the most demanding target needs. With a
+    FeedCache, entries() returns None for feeds unchanged since last run,
+    and changed feeds come back as the list the cache already parsed.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache
+        self._entries = {}
+        self._errors = {}
+        self.fetch_count = 0
+        self.request_count = 0
+
+    def prefetch(self, channel_ids):
+        """Download every not-yet-seen feed concurrently."""
+        missing = []
+        for channel_id in channel_ids:
+            if channel_id in self._entries or channel_id in self._errors or channel_id in missing:
+                continue
+            missing.append(channel_id)
+
+        for channel_id, videos, error in fetch_channels(missing, self.cache, parse=LazyEntries):
+            self.fetch_count += 1
+            if error is not None:
+                self._errors[channel_id] = error
+            else:
+                self._entries[channel_id] = videos
+
+    def entries(self, channel_id):
+        self.request_count += 1
+
+        # A failed feed is not retried by the next target on the same channel
+        if channel_id in self._errors:
+            raise self._errors[channel_id]
+
+        if channel_id not in self._entries:
+            self.fetch_count += 1
+            try:
+                self._entries[channel_id] = fetch_channel_feed(channel_id, self.cache, parse=LazyEntries)
+            except Exception as e:
+                self._errors[channel_id] = e
+                raise
+
+        return self._entries[channel_id]
@@ -0,0 +1,111 @@
+import json
+import os
+import sqlite3
+import time
+
+from fetch_common import CACHE_DIR
+from fetch_common.youtube import VideoInfo
+
+# ---------------- CONFIG ----------------
+CACHE_DB_PATH = os.path.join(CACHE_DIR, "fetch_cache.sqlite")
+
+LIVE_STATUS_TTL_SECONDS = int(os.environ.get("LIVE_STATUS_TTL_SECONDS", "300"))
+
+# Seconds each cached field stays valid; None = never expires.
+# Duration and thumbnail are only stored once a video is a finished VOD,
+# and a "none" (finished VOD) live status is final, so it never expires.
+FIELD_TTLS = {
+    "live_broadcast_content": LIVE_STATUS_TTL_SECONDS,
+    "duration_seconds": None,
+    "thumbnail": None,
+}
+# --------------------------------------
+
+
+def connect_cache_db(path=CACHE_DB_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return sqlite3.connect(path)
+
+
+class VideoMetaCache:
+    """On-disk videos.list results keyed by (video_id, field), with per-field TTLs."""
+
+    def __init__(self, conn=None):
+        self.conn = conn or connect_cache_db()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS video_meta ("
+            " video_id TEXT NOT NULL,"
+            " field TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " PRIMARY KEY (video_id, field))"
+        )
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh_fields(self, video_id, now):
+        rows = self.conn.execute(
+            "SELECT field, value, fetched_at FROM video_meta WHERE video_id = ?",
+            (video_id,)
+        ).fetchall()
+
+        fields = {}
+        for field, value, fetched_at in rows:
+            value = json.loads(value)
+            ttl = FIELD_TTLS.get(field)
+            if field == "live_broadcast_content" and value == "none":
+                ttl = None
+            if ttl is not None and now - fetched_at > ttl:
+                continue
+            fields[field] = value
+        return fields
+
+    def get_many(self, video_ids):
+        """Split IDs into cached VideoInfo hits and IDs that need the API."""
+        now = time.time()
+        hits = {}
+        misses = []
+
+        for vid in video_ids:
+            fields = self._fresh_fields(vid, now)
+            status = fields.get("live_broadcast_content")
+
+            if status is None:
+                misses.append(vid)
+                continue
+
+            # Live/upcoming only needs a fresh status to be excluded again
+            # A 0 duration cached by older runs counts as missing too
+            if status == "none" and (not fields.get("duration_seconds") or "thumbnail" not in fields):
+                misses.append(vid)
+                continue
+
+            hits[vid] = VideoInfo(
+                video_id=vid,
+                live_broadcast_content=status,
+                duration_seconds=fields.get("duration_seconds", 0),
+                thumbnail=fields.get("thumbnail", f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg"),
+            )
+
+        self.hits += len(hits)
+        self.misses += len(misses)
+        return hits, misses
+
+    def put_many(self, infos):
+        now = time.time()
+        rows = []
+
+        for info in infos:
+            rows.append((info.video_id, "live_broadcast_content", json.dumps(info.live_broadcast_content), now))
+            if info.live_broadcast_content == "none":
+                # 0 is "no duration yet", not a real length; leave it to be re-fetched
+                if info.duration_seconds:
+                    rows.append((info.video_id, "duration_seconds", json.dumps(info.duration_seconds), now))
+                rows.append((info.video_id, "thumbnail", json.dumps(info.thumbnail), now))
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO video_meta (video_id, field, value, fetched_at) VALUES (?, ?, ?, ?)",
+            rows
+        )
+        self.conn.commit()
@@ -0,0 +1,214 @@
+import re
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from fetch_common import http_client
+
+VIDEOS_URL = "https://www.googleapis.com/youtube/v3/videos"
+MAX_IDS_PER_CALL = 50  # videos.list hard limit
+
+
+# ---------------- HELPER: CHUNK LIST ----------------
+def chunk_list(data, chunk_size):
+    """Yield successive chunks from list."""
+    for i in range(0, len(data), chunk_size):
+        yield data[i:i + chunk_size]
+
+
+def get_best_thumbnail(thumbnails: dict, video_id: str) -> str:
+    for key in ("maxres", "standard", "high", "medium", "default"):
+        if key in thumbnails and "url" in thumbnails[key]:
+            return thumbnails[key]["url"]
+
+    # Absolute safety fallback
+    return f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
+
+
+def iso8601_to_seconds(duration):
+    # Streams over a day come back as P1DT2H3M4S; 0 means "not known yet"
+    match = re.match(r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$", duration)
+    if not match:
+        return 0
+    d = int(match.group(1) or 0)
+    h = int(match.group(2) or 0)
+    m = int(match.group(3) or 0)
+    s = int(match.group(4) or 0)
+    return d * 86400 + h * 3600 + m * 60 + s
+
+
+def rfc3339_to_epoch(value):
+    """Epoch seconds for an API timestamp like 2024-01-01T10:00:00Z, or None."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+# ---------------- VIDEOS.LIST BATCHER ----------------
+class VideoLoad:
+    """One caller's share of a batched videos.list lookup."""
+
+    def __init__(self, batcher, video_ids, parts):
+        self.batcher = batcher
+        self.video_ids = list(video_ids)
+        self.parts = set(parts)
+
+    def result(self):
+        """Return the found items in request order, dispatching if still pending."""
+        self.batcher.dispatch()
+
+        items = []
+        for vid in self.video_ids:
+            if vid in self.batcher._errors:
+                raise self.batcher._errors[vid]
+            item = self.batcher._items.get(vid)
+            if item is not None:
+                items.append(item)
+        return items
+
+
+class VideoBatcher:
+    """
+    Collects videos.list lookups from many callers and sends them as the
+    fewest possible 50-ID calls. Quota is charged per call, not per part,
+    so every call asks for the union of the parts requested so far.
+    """
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+        self._pending = []
+        self._items = {}
+        self._parts = {}
+        self._errors = {}
+        self.call_count = 0
+        self.id_count = 0
+
+    def load(self, video_ids, parts):
+        request = VideoLoad(self, video_ids, parts)
+        self._pending.append(request)
+        return request
+
+    def not_returned(self, video_id):
+        """
+        True when a call that succeeded came back without this ID (video
+        deleted or made private), as opposed to a call that failed.
+        """
+        return video_id in self._items and self._items[video_id] is None
+
+    def dispatch(self):
+        if not self._pending:
+            return
+
+        wanted_parts = set()
+        for request in self._pending:
+            wanted_parts |= request.parts
+
+        # Keep first-seen order and skip IDs already fetched with enough parts
+        to_fetch = []
+        seen = set()
+        for request in self._pending:
+            for vid in request.video_ids:
+                if vid in seen or wanted_parts <= self._parts.get(vid, set()):
+                    continue
+                seen.add(vid)
+                to_fetch.append(vid)
+
+        self._pending = []
+        part = ",".join(sorted(wanted_parts))
+
+        for chunk in chunk_list(to_fetch, MAX_IDS_PER_CALL):
+            params = {
+                "part": part,
+                "id": ",".join(chunk),
+                "key": self.api_key,
+                "maxResults": MAX_IDS_PER_CALL
+            }
+
+            self.call_count += 1
+            self.id_count += len(chunk)
+            try:
+                r = http_client.get(VIDEOS_URL, params=params, stage="api")
+                r.raise_for_status()
+                items = r.json().get("items", [])
+            except Exception as e:
+                for vid in chunk:
+                    self._errors[vid] = e
+                continue
+
+            for vid in chunk:
+                self._parts[vid] = wanted_parts
+                self._items[vid] = None
+                self._errors.pop(vid, None)
+            for item in items:
+                self._items[item["id"]] = item
+
+
+# ---------------- ENRICHMENT (SINGLE PASS) ----------------
+# liveStreamingDetails rides along for free: quota is per call, not per part
+ENRICH_PARTS = ("snippet", "contentDetails", "liveStreamingDetails")
+
+
+class VideoInfo(NamedTuple):
+    """What the catalog pipelines need to know about one video."""
+    video_id: str
+    live_broadcast_content: str  # "none" | "live" | "upcoming"
+    duration_seconds: int
+    thumbnail: str
+    scheduled_start: Optional[float] = None  # epoch seconds, live/upcoming only
+    actual_start: Optional[float] = None
+
+
+def video_info_from_item(item):
+    vid = item["id"]
+    snippet = item.get("snippet", {})
+    iso = item.get("contentDetails", {}).get("duration", "")
+    live_details = item.get("liveStreamingDetails", {})
+
+    return VideoInfo(
+        video_id=vid,
+        live_broadcast_content=snippet.get("liveBroadcastContent", "none"),
+        duration_seconds=iso8601_to_seconds(iso),
+        thumbnail=get_best_thumbnail(snippet.get("thumbnails", {}), vid),
+        scheduled_start=rfc3339_to_epoch(live_details.get("scheduledStartTime")),
+        actual_start=rfc3339_to_epoch(live_details.get("actualStartTime")),
+    )
+
+
+def enrich_videos(video_ids, batcher, cache=None):
+    """
+    Live status, duration, best thumbnail and broadcast times for every
+    ID from one videos.list lookup per 50 IDs. With a VideoMetaCache only
+    cache misses reach the API. IDs whose chunk failed or that YouTube no
+    longer returns are missing from the result.
+    """
+    info_map = {}
+    video_ids = list(video_ids)
+
+    if cache is not None:
+        info_map, video_ids = cache.get_many(video_ids)
+
+    loads = [
+        batcher.load(chunk, ENRICH_PARTS)
+        for chunk in chunk_list(video_ids, MAX_IDS_PER_CALL)
+    ]
+    batcher.dispatch()
+
+    fetched = []
+    for load in loads:
+        try:
+            items = load.result()
+        except Exception as e:
+            print(f"⚠️ Error fetching video details: {e}")
+            continue
+
+        for item in items:
+            info = video_info_from_item(item)
+            info_map[info.video_id] = info
+            fetched.append(info)
+
+    if cache is not None and fetched:
+        cache.put_many(fetched)
+
+    return info_map